@@ -1,11 +1,14 @@
+import asyncio
+
 from config.config import (
     ISSUE_URL, load_issue_field_keys, TRACKER_CHECKLIST_ISSUE_ID, get_settings, DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME)
 from models import ProcessIssueRequest
 from utils.log import LoggerUtils
-from utils.process_issue import process_and_update_issue, set_listitem_done_status
+from utils.process_issue import (
+    process_and_update_issue, set_listitem_done_status, create_checklist_update_buffer)
 from utils.tracker import (
     get_issue, process_checklist_items, clear_error_field, delete_tracker_issue,
-    report_aggregated_errors)
+    report_aggregated_errors, CHECKLIST_ISSUE_FIELDS)
 from utils.utils import ErrorList
 
 
@@ -13,8 +16,9 @@ from utils.utils import ErrorList
 async def process_checklist():
     # Initial setup: clear errors and fetch issues
     checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
+    checklist_issue = await get_issue(TRACKER_CHECKLIST_ISSUE_ID, fields=CHECKLIST_ISSUE_FIELDS)
+    # Read first, so that an error field that is already empty is not written
     await clear_error_field(checklist_issue_url)
-    checklist_issue = await get_issue(TRACKER_CHECKLIST_ISSUE_ID)
 
     # Process each checklist item
     checked_items, unchecked_items, checklist_error_messages = await process_checklist_items(checklist_issue)
@@ -37,33 +41,65 @@ async def process_issues(request: ProcessIssueRequest):
     config = await get_settings()
     issue_field_keys = load_issue_field_keys()
     response_data = {'errors': ErrorList(), 'processed_issues': []}
-    for issue in request.issues:
-        issue_patch_url = ISSUE_URL.format(issue_id=issue.key)
-        await clear_error_field(issue_patch_url)
-        try:
-            # Process fetched data and update tracker fields
-            await process_and_update_issue(issue, issue_patch_url, issue_field_keys, response_data)
-
-            response_data['processed_issues'].append({'key': issue.key, 'link': issue.link})
-
-        except Exception as e:
-            error_msg = LoggerUtils(__name__).log(
-                msg_or_err_code=str(e), level=LoggerUtils.levels.ERROR, e=e,
-                issue_id=issue.key, issue_link=issue.link)
-            await response_data['errors'].append((issue.key, error_msg))
-        finally:
-            if issue.done:
-                # The issue was successfully processed.
-                if config['delete_done_checklist_items']:
-                    checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
-                    checklist_item_url = f'{checklist_issue_url}/checklistItems/{issue.checklist_item_id}/'
-                    await delete_tracker_issue(checklist_item_url)
-            else:
-                # Checking issue as done here means it was processed
-                # and will not be scheduled for processing until unchecked.
-                # The date is set to a future date to indicate there was
-                # an issue processing it.
-                await set_listitem_done_status(checklist_item_id=issue.checklist_item_id, done=True, deadline_datetime=DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME)
-                issue.done = True
+    # Issues are processed concurrently, at most one per browser tab.
+    semaphore = asyncio.Semaphore(config['browser_tab_pool_size'])
+
+    # Checklist item changes are sent together at the end of the run if bulk_checklist_updates is set
+    checklist_updates = create_checklist_update_buffer(config)
 
+    async def process_issue(issue):
+        async with semaphore:
+            await _process_issue(issue, config, issue_field_keys, response_data, checklist_updates)
+
+    try:
+        # An issue failing outside of _process_issue's own error handling does not abort the others
+        outcomes = await asyncio.gather(*(process_issue(issue) for issue in request.issues), return_exceptions=True)
+        for (issue, outcome) in zip(request.issues, outcomes):
+            if isinstance(outcome, BaseException):
+                error_msg = LoggerUtils(__name__).log(
+                    'issue_processing_failed', level=LoggerUtils.levels.ERROR, e=outcome, issue_id=issue.key)
+                await response_data['errors'].append((issue.key, error_msg))
+    finally:
+        # The changes buffered so far are sent even if the run is interrupted
+        if checklist_updates is not None and checklist_updates.pending:
+            failed_items = await checklist_updates.flush()
+            issue_keys = {issue.checklist_item_id: issue.key for issue in request.issues}
+            for (checklist_item_id, status_code) in failed_items.items():
+                error_msg = LoggerUtils(__name__).log(
+                    'failed_to_patch_checklist_item', level=LoggerUtils.levels.ERROR,
+                    checklist_item_id=checklist_item_id, status_code=status_code)
+                await response_data['errors'].append((issue_keys[checklist_item_id], error_msg))
     return response_data
+
+
+async def _process_issue(issue, config, issue_field_keys, response_data, checklist_updates=None):
+    issue_patch_url = ISSUE_URL.format(issue_id=issue.key)
+    # The error field is cleared by the PATCH of the issue fields
+    try:
+        # Process fetched data and update tracker fields
+        await process_and_update_issue(issue, issue_patch_url, issue_field_keys, response_data, checklist_updates)
+
+        response_data['processed_issues'].append({'key': issue.key, 'link': issue.link})
+
+    except Exception as e:
+        error_msg = LoggerUtils(__name__).log(
+            msg_or_err_code=str(e), level=LoggerUtils.levels.ERROR, e=e,
+            issue_id=issue.key, issue_link=issue.link)
+        await response_data['errors'].append((issue.key, error_msg))
+    finally:
+        if issue.done:
+            # The issue was successfully processed.
+            if config['delete_done_checklist_items']:
+                checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
+                checklist_item_url = f'{checklist_issue_url}/checklistItems/{issue.checklist_item_id}/'
+                if checklist_updates is not None:
+                    checklist_updates.discard(issue.checklist_item_id)
+                await delete_tracker_issue(checklist_item_url)
+        else:
+            # Checking issue as done here means it was processed
+            # and will not be scheduled for processing until unchecked.
+            # The date is set to a future date to indicate there was
+            # an issue processing it.
+            await set_listitem_done_status(checklist_item_id=issue.checklist_item_id, done=True,
+                                           deadline_datetime=DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME, updates=checklist_updates)
+            issue.done = True
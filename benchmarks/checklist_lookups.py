@@ -0,0 +1,74 @@
+"""
+Times the issue lookups of process_checklist_items against a local fake tracker answering every request
+after a fixed latency, with the lookups run one at a time and with tracker_lookup_concurrency.
+
+Run from the project root with a configured .env:
+    python -m benchmarks.checklist_lookups [item_count] [latency_ms]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from config.config import TRACKER_LINK_KEY, get_settings_sync
+from models import ChecklistItem, IssueModel
+from utils.tracker import process_checklist_items
+from utils.tracker_client import tracker_http_client
+
+
+class FakeTracker:
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency_seconds)
+        issue_id = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        if request.method != 'GET':
+            return httpx.Response(200, json={})
+        if issue_id.endswith('missing'):
+            return httpx.Response(404)
+        # Every fifth issue has no link, which is reported on the issue
+        link = None if issue_id.endswith('0') else f'https://pierce.example/content/tasks/{issue_id}/'
+        return httpx.Response(200, json={'key': issue_id, TRACKER_LINK_KEY: link})
+
+
+async def measure(checklist_issue, latency_seconds: float) -> tuple:
+    tracker = FakeTracker(latency_seconds)
+    tracker_http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(tracker.handle))
+    started_at = time.perf_counter()
+    result = await process_checklist_items(checklist_issue)
+    seconds = time.perf_counter() - started_at
+    await tracker_http_client.aclose()
+    return result, seconds, tracker.requests
+
+
+async def run(item_count: int, latency_seconds: float):
+    checklist_issue = IssueModel(checklistItems=[
+        ChecklistItem(id=f'item{index}', text=f'ISSUE-{index}' if index % 7 else f'ISSUE-{index}-missing',
+                      checked=index % 3 == 0)
+        for index in range(item_count)])
+    settings = get_settings_sync()
+    initial_concurrency = settings['tracker_lookup_concurrency']
+    results = {}
+    try:
+        for concurrency in dict.fromkeys([1, initial_concurrency]):
+            settings['tracker_lookup_concurrency'] = concurrency
+            (result, seconds, requests) = await measure(checklist_issue, latency_seconds)
+            results[concurrency] = result
+            print(f'concurrency {concurrency:3}: {seconds * 1000:8.1f} ms, {requests} requests '
+                  f'for {item_count} checklist items')
+    finally:
+        settings['tracker_lookup_concurrency'] = initial_concurrency
+    # The items come back in checklist order whatever the concurrency
+    assert len({repr(result) for result in results.values()}) == 1
+
+
+def main(item_count: int = 100, latency_ms: float = 50):
+    asyncio.run(run(item_count, latency_ms / 1000))
+
+
+if __name__ == '__main__':
+    main(*(float(arg) if index else int(arg) for (index, arg) in enumerate(sys.argv[1:3])))
@@ -0,0 +1,70 @@
+"""
+Counts the tracker requests spent on checklist item changes with and without bulk_checklist_updates,
+against a local fake tracker that accepts PATCH requests of single checklist items and, optionally,
+of the whole checklist.
+
+Run from the project root with a configured .env:
+    python -m benchmarks.checklist_updates [item_count]
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+import httpx
+
+from config.config import DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME
+from utils.process_issue import ChecklistUpdateBuffer, set_listitem_done_status
+from utils.tracker_client import tracker_http_client
+
+
+class FakeTracker:
+    def __init__(self, accepts_bulk: bool):
+        self.accepts_bulk = accepts_bulk
+        self.requests = 0
+        self.checked = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        body = json.loads(request.content)
+        if request.url.path.rstrip('/').endswith('/checklistItems'):
+            if not self.accepts_bulk:
+                return httpx.Response(405)
+            for item in body:
+                self.checked[item['id']] = item['checked']
+        else:
+            self.checked[request.url.path.rstrip('/').rsplit('/', 1)[-1]] = body['checked']
+        return httpx.Response(200, json={})
+
+
+async def update_items(item_count: int, updates) -> dict:
+    for index in range(item_count):
+        # Every other item is checked with a deferred deadline first, as a failed issue is, then checked as done
+        if index % 2:
+            await set_listitem_done_status(f'item{index}', done=True,
+                                           deadline_datetime=DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME,
+                                           updates=updates)
+        await set_listitem_done_status(f'item{index}', done=True, deadline_datetime=datetime.now(), updates=updates)
+    if updates is not None:
+        assert not await updates.flush()
+
+
+async def run(item_count: int):
+    for (name, accepts_bulk, bulk) in [
+            ('per item', True, False),
+            ('bulk', True, True),
+            ('bulk, rejected by the tracker', False, True)]:
+        tracker = FakeTracker(accepts_bulk)
+        tracker_http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(tracker.handle))
+        await update_items(item_count, ChecklistUpdateBuffer(max_items_per_request=100) if bulk else None)
+        await tracker_http_client.aclose()
+        assert len(tracker.checked) == item_count and all(tracker.checked.values())
+        print(f'{name:>30}: {tracker.requests:5} requests for {item_count} items')
+
+
+def main(item_count: int = 300):
+    asyncio.run(run(item_count))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
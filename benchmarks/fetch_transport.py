@@ -0,0 +1,50 @@
+"""
+Compares per-fetch latency of the in-page fetch transports against a live browser.
+
+Run from the project root with a configured .env:
+    python -m benchmarks.fetch_transport [fetch_count]
+"""
+import statistics
+import sys
+import time
+
+from config.config import (
+    BROWSER_START_URL, BROWSER_START_URL_LOADING_ELEMENT_SELECTOR, DRIVER_INITIALIZATION_TIMEOUT,
+    BROWSER_DOWNLOAD_DIRECTORY, TEST_FETCH_BREADCRUMBS_URL, get_settings_sync)
+from utils.browser_manager import BreadcrumbsBrowserManager, FETCH_TRANSPORT_CALLBACK, FETCH_TRANSPORT_DOWNLOAD
+from utils.pierce_api import preprocess_url
+
+
+def measure_transport(browser_manager, transport: str, url: str, fetch_count: int) -> list:
+    settings = get_settings_sync()
+    settings['fetch_transport'] = transport
+    browser_manager.fetch_from_external_api_sync(url, url_source='benchmark_warm_up')
+    durations = []
+    for _ in range(fetch_count):
+        started_at = time.perf_counter()
+        browser_manager.fetch_from_external_api_sync(url, url_source='benchmark')
+        durations.append(time.perf_counter() - started_at)
+    return durations
+
+
+def main(fetch_count: int = 20):
+    browser_manager = BreadcrumbsBrowserManager(
+        start_url=BROWSER_START_URL,
+        loading_element_selector=BROWSER_START_URL_LOADING_ELEMENT_SELECTOR,
+        driver_initialization_timeout=DRIVER_INITIALIZATION_TIMEOUT,
+        browser_download_dir=BROWSER_DOWNLOAD_DIRECTORY,
+        test_fetch_from_external_api_url=TEST_FETCH_BREADCRUMBS_URL)
+    url = preprocess_url(TEST_FETCH_BREADCRUMBS_URL)
+    initial_transport = get_settings_sync()['fetch_transport']
+    try:
+        for transport in (FETCH_TRANSPORT_DOWNLOAD, FETCH_TRANSPORT_CALLBACK):
+            durations = measure_transport(browser_manager, transport, url, fetch_count)
+            print(f'{transport:>10}: mean {statistics.mean(durations) * 1000:8.1f} ms, '
+                  f'median {statistics.median(durations) * 1000:8.1f} ms, '
+                  f'max {max(durations) * 1000:8.1f} ms over {fetch_count} fetches')
+    finally:
+        get_settings_sync()['fetch_transport'] = initial_transport
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,68 @@
+"""
+Compares the cold-start time of resolving resources with and without the persistent resource store.
+A cold start is simulated by emptying the in-memory resource cache; the resources are the API URLs of TEST_URLS,
+cached for the duration of the run regardless of resource_cache_ttl_seconds.
+
+Run from the project root with a configured .env:
+    python -m benchmarks.resource_store
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from config.config import (
+    BROWSER_START_URL, BROWSER_START_URL_LOADING_ELEMENT_SELECTOR, DRIVER_INITIALIZATION_TIMEOUT,
+    BROWSER_DOWNLOAD_DIRECTORY, TEST_FETCH_BREADCRUMBS_URL, get_settings_sync, test_urls)
+from utils.browser_manager import BreadcrumbsBrowserManager
+from utils.pierce_api import preprocess_url, big_resource_types, small_resource_types
+from utils.resource_cache import ResourceCache
+from utils.resource_store import ResourceStore
+
+
+async def measure_cold_start(browser_manager, urls: list) -> float:
+    browser_manager.resource_cache = ResourceCache(max_entries=len(urls))
+    started_at = time.perf_counter()
+    for url in urls:
+        await browser_manager.fetch_from_external_api_async(url, url_source='benchmark')
+    return time.perf_counter() - started_at
+
+
+async def run(browser_manager, store: ResourceStore, urls: list):
+    without_store = await measure_cold_start(browser_manager, urls)
+    browser_manager.resource_store = store
+    await measure_cold_start(browser_manager, urls)  # Fills the store
+    with_store = await measure_cold_start(browser_manager, urls)
+    await browser_manager.aclose()
+    print(f'without store: {without_store * 1000:8.1f} ms for {len(urls)} resources')
+    print(f'   with store: {with_store * 1000:8.1f} ms for {len(urls)} resources '
+          f'({store.stats()["payload_bytes"]} compressed payload bytes)')
+
+
+def main():
+    browser_manager = BreadcrumbsBrowserManager(
+        start_url=BROWSER_START_URL,
+        loading_element_selector=BROWSER_START_URL_LOADING_ELEMENT_SELECTOR,
+        driver_initialization_timeout=DRIVER_INITIALIZATION_TIMEOUT,
+        browser_download_dir=BROWSER_DOWNLOAD_DIRECTORY,
+        test_fetch_from_external_api_url=TEST_FETCH_BREADCRUMBS_URL)
+    urls = list(dict.fromkeys(preprocess_url(url) for url in test_urls))
+    settings = get_settings_sync()
+    initial_ttls = settings['resource_cache_ttl_seconds']
+    settings['resource_cache_ttl_seconds'] = {
+        resource_type: 60 * 60 for resource_type in big_resource_types + small_resource_types}
+    (store_fd, store_path) = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(store_fd)
+    store = ResourceStore(store_path, max_entries=len(urls))
+    try:
+        asyncio.run(run(browser_manager, store, urls))
+    finally:
+        settings['resource_cache_ttl_seconds'] = initial_ttls
+        store.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(store_path + suffix):
+                os.remove(store_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
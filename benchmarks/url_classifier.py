@@ -0,0 +1,85 @@
+"""
+Compares the single-scan URL classifier against the previous per-type regex search,
+first checking that both classify a set of sample URLs the same way.
+
+Run from the project root with a configured .env:
+    python -m benchmarks.url_classifier [repeat_count]
+"""
+import re
+import sys
+import timeit
+
+from utils.pierce_api import (
+    classify_url, identify_resource, extract_sprint_id, small_resource_types, big_resource_types,
+    get_api_url_for_small_resource, get_api_url_for_big_resource, get_resource_plural_name)
+
+SAMPLE_URLS = [
+    'https://pierce.example/content/faculties/f1/professions/p1/tracks/t1/courses/c1/sprints/123/topics/tp1/lessons/l1/tasks/task-1/?tab=editor',
+    'https://pierce.example/content/courses/c1/sprints/42/topics/tp1/lessons/l1/',
+    'https://pierce.example/content/Courses/C-Upper/topics/tp2/',
+    'https://pierce.example/content/faculty/f2/',
+    'https://pierce.example/content/tracks/t3/?from=/tasks/ignored/',
+    'https://pierce.example/content/courses/tasks/task-as-id/',
+    'https://pierce.example/content/sprints/not-a-number/task/t9/',
+    'https://pierce.example/content/swagger/',
+]
+
+
+def legacy_identify_resource(url: str) -> tuple:
+    url = url.split('?')[0]
+    for resource in small_resource_types:
+        match = re.search(fr'/{resource}s?/([^/]+)', url, re.IGNORECASE)
+        if match:
+            resource_id = match.group(1)
+            return (resource, f'{resource}s', get_api_url_for_small_resource(resource, resource_id), resource_id)
+    for resource in big_resource_types:
+        resource_plural = get_resource_plural_name(resource)
+        match = re.search(fr'/(?:{resource}|{resource_plural})/([^/]+)', url, re.IGNORECASE)
+        if match:
+            resource_id = match.group(1)
+            return (resource, resource_plural, get_api_url_for_big_resource(resource, resource_id), resource_id)
+    raise ValueError('Invalid URL or unsupported resource type')
+
+
+def legacy_extract_sprint_id(url):
+    match = re.search(r'/sprints/(\d+)/', url)
+    return match.group(1) if match else None
+
+
+def classify_legacy(url: str):
+    try:
+        resource = legacy_identify_resource(url)
+    except ValueError:
+        resource = None
+    return resource, legacy_extract_sprint_id(url)
+
+
+def classify_current(url: str):
+    try:
+        resource = identify_resource(url)
+    except ValueError:
+        resource = None
+    return resource, extract_sprint_id(url)
+
+
+def main(repeat_count: int = 10000):
+    for url in SAMPLE_URLS:
+        assert classify_legacy(url) == classify_current(url), url
+
+    def run_uncached():
+        classify_url.cache_clear()
+        for url in SAMPLE_URLS:
+            classify_current(url)
+
+    timings = {
+        'per-type regex search': lambda: [classify_legacy(url) for url in SAMPLE_URLS],
+        'single scan, cold memo': run_uncached,
+        'single scan, warm memo': lambda: [classify_current(url) for url in SAMPLE_URLS],
+    }
+    for (name, run) in timings.items():
+        seconds = timeit.timeit(run, number=repeat_count)
+        print(f'{name:>24}: {seconds / (repeat_count * len(SAMPLE_URLS)) * 1e6:6.2f} us per url')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -2,6 +2,7 @@ import ast
 import json
 import os
 from pathlib import Path
+from typing import Dict, Literal
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -26,13 +27,16 @@ try:
     TRACKER_LINK_KEY = os.environ['TRACKER_LINK_KEY']
     TRACKER_BREADCRUMBS_ERROR_KEY = os.environ['TRACKER_BREADCRUMBS_ERROR_KEY']
     DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME = os.environ['DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME']
+    TRACKER_OAUTH_TOKEN = os.getenv('TRACKER_OAUTH_TOKEN')
     DEBUGGING_BROWSER_PORT = int(os.getenv('DEBUGGING_BROWSER_PORT'))
+    # A warm standby browser is kept only if its port is set
+    STANDBY_DEBUGGING_BROWSER_PORT = int(os.getenv('STANDBY_DEBUGGING_BROWSER_PORT') or 0) or None
 
     BROWSER_TYPE = os.getenv('BROWSER_TYPE', 'chrome').lower()
-    BROWSER_PROCESS_NAME = os.getenv('BROWSER_PROCESS_NAME', 'chrome').lower()
     BROWSER_PATH = os.getenv('BROWSER_PATH')
     RUN_BROWSER_LOCALLY = str2bool(os.environ.get('RUN_BROWSER_LOCALLY'))
     ROOT_DIR = Path(__file__).parent.parent
+    STANDBY_BROWSER_USER_DATA_DIR = os.getenv('STANDBY_BROWSER_USER_DATA_DIR') or str(ROOT_DIR / 'standby_browser_profile')
     if os.path.exists(os.getenv('DRIVER_SERVICE')):
         DRIVER_SERVICE = os.getenv('DRIVER_SERVICE')
     else:
@@ -130,5 +134,44 @@ class ConfigModel(BaseModel):
     uncheck_deferred_issues_frequency_seconds: int = Field(
         default=settings.get('uncheck_deferred_issues_frequency_seconds', 60), gt=0, le=60 * 60 * 24)
     delete_done_checklist_items: bool = settings.get('delete_done_checklist_items', False)
+    bulk_checklist_updates: bool = settings.get('bulk_checklist_updates', False)
+    bulk_checklist_update_max_items: int = Field(default=settings.get('bulk_checklist_update_max_items', 100), gt=0, le=1000)
     modify_browser_page_on_fetch: bool = settings.get('modify_browser_page_on_fetch', False)
+    fetch_transport: Literal['callback', 'download'] = settings.get('fetch_transport', 'callback')
+    callback_transport_chunk_size: int = Field(
+        default=settings.get('callback_transport_chunk_size', 1024 * 1024), gt=0)
+    download_wait_timeout_seconds: float = Field(
+        default=settings.get('download_wait_timeout_seconds', 10), gt=0, le=60 * 10)
+    browser_tab_pool_size: int = Field(default=settings.get('browser_tab_pool_size', 1), gt=0, le=32)
+    driver_command_workers: int = Field(default=settings.get('driver_command_workers', 4), gt=0, le=64)
+    direct_http_fetch: bool = settings.get('direct_http_fetch', False)
+    direct_http_timeout_seconds: float = Field(default=settings.get('direct_http_timeout_seconds', 10), gt=0, le=60 * 10)
+    direct_http_max_connections: int = Field(default=settings.get('direct_http_max_connections', 10), gt=0, le=100)
+    browser_health_probe_interval_seconds: int = Field(
+        default=settings.get('browser_health_probe_interval_seconds', 60), gt=0, le=60 * 60)
+    browser_health_ttl_seconds: int = Field(default=settings.get('browser_health_ttl_seconds', 120), ge=0, le=60 * 60)
+    browser_engine: Literal['selenium', 'cdp'] = settings.get('browser_engine', 'selenium')
+    cdp_max_concurrent_evaluations: int = Field(default=settings.get('cdp_max_concurrent_evaluations', 16), gt=0, le=256)
+    resource_cache_max_entries: int = Field(default=settings.get('resource_cache_max_entries', 1000), gt=0)
+    resource_cache_ttl_seconds: Dict[str, float] = Field(default=settings.get('resource_cache_ttl_seconds', {}))
+    hierarchy_fetch_concurrency: int = Field(default=settings.get('hierarchy_fetch_concurrency', 6), gt=0, le=32)
+    content_index_enabled: bool = settings.get('content_index_enabled', False)
+    content_index_crawl_interval_seconds: int = Field(
+        default=settings.get('content_index_crawl_interval_seconds', 30), gt=0, le=60 * 60 * 24)
+    content_index_refresh_interval_seconds: int = Field(
+        default=settings.get('content_index_refresh_interval_seconds', 60 * 60), gt=0)
+    content_index_max_age_seconds: int = Field(
+        default=settings.get('content_index_max_age_seconds', 60 * 60 * 24), gt=0)
+    tracker_timeout_seconds: float = Field(default=settings.get('tracker_timeout_seconds', 5), gt=0, le=60 * 10)
+    tracker_max_connections: int = Field(default=settings.get('tracker_max_connections', 20), gt=0, le=100)
+    tracker_http2: bool = settings.get('tracker_http2', False)
+    tracker_snapshot_ttl_seconds: float = Field(default=settings.get('tracker_snapshot_ttl_seconds', 300), ge=0)
+    tracker_lookup_concurrency: int = Field(default=settings.get('tracker_lookup_concurrency', 10), gt=0, le=100)
+    negative_cache_base_seconds: float = Field(default=settings.get('negative_cache_base_seconds', 60), ge=0)
+    negative_cache_max_seconds: float = Field(default=settings.get('negative_cache_max_seconds', 60 * 60), gt=0)
+    resource_store_enabled: bool = settings.get('resource_store_enabled', False)
+    resource_store_path: str = settings.get('resource_store_path', 'resource_store.sqlite3')
+    resource_store_max_entries: int = Field(default=settings.get('resource_store_max_entries', 10000), gt=0)
+    resource_store_max_age_seconds: float = Field(
+        default=settings.get('resource_store_max_age_seconds', 60 * 60 * 24 * 7), gt=0)
     ignore_errors: dict = Field(default=settings['ignore_errors'])
@@ -70,29 +70,53 @@ function fetchBreadcrumbs(url, download_to_filename, callback) {
 }
 
 
+const payloadStoreName = '__breadcrumbsPayloads';
+
+function downloadJson(data, download_to_filename) {
+    const blob = new Blob([JSON.stringify(data, null, 2)], {type: 'application/json'});
+    const downloadLink = document.createElement('a');
+    downloadLink.href = URL.createObjectURL(blob);
+    downloadLink.download = download_to_filename || 'download.json';
+    downloadLink.click();
+}
+
+// Returns data to the `execute_async_script` callback as is, or, if its JSON
+// exceeds chunkSize, parks it in a page global to be read back in chunks.
+function packCallbackPayload(data, chunkSize) {
+    const serialized = JSON.stringify(data);
+    if (!chunkSize || serialized.length <= chunkSize) {
+        return {data};
+    }
+    const store = window[payloadStoreName] = window[payloadStoreName] || {};
+    const payloadId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    store[payloadId] = serialized;
+    return {chunked: {payloadId, length: serialized.length, chunkSize}};
+}
+
 // Substitute callback for this function when debugging in JS console:
 // function myCallback(result) {
 //     console.log('Callback result:', result);
 // }
 function fetchApiUrl(args) {
-    const { apiUrl, download_to_filename, modifyDocument = false, callback } = args;
+    const {
+        apiUrl, download_to_filename, modifyDocument = false, transport = 'download', chunkSize, callback
+    } = args;
     try {
         fetch(apiUrl)
             .then(response => response.json())
             .then(data => {
-                const blob = new Blob([JSON.stringify(data, null, 2)], {type: 'application/json'});
-                const downloadLink = document.createElement('a');
-                downloadLink.href = URL.createObjectURL(blob);
-                downloadLink.download = download_to_filename || 'download.json';
-                downloadLink.click();
-
                 if (modifyDocument) {
                     const jsonDisplay = document.createElement('pre');
                     jsonDisplay.textContent = JSON.stringify(data, null, 2);
                     document.body.appendChild(jsonDisplay);
                 }
 
-                callback({data}); // Success callback
+                if (transport === 'callback') {
+                    callback(packCallbackPayload(data, chunkSize)); // Success callback
+                } else {
+                    downloadJson(data, download_to_filename);
+                    callback({data}); // Success callback
+                }
             })
             .catch(error => {
                 callback({error: error.message}); // Error in fetch/JSON processing
@@ -101,3 +125,55 @@ function fetchApiUrl(args) {
         callback({error: error.message}); // Error in fetchApiUrl
     }
 }
+
+// Returns a function running the tasks given to it at most `concurrency` at a time.
+function createLimiter(concurrency) {
+    let active = 0;
+    const queue = [];
+    const next = () => {
+        if (active >= concurrency || !queue.length) {
+            return;
+        }
+        active++;
+        const {task, resolve, reject} = queue.shift();
+        task().then(resolve, reject).finally(() => {
+            active--;
+            next();
+        });
+    };
+    return task => new Promise((resolve, reject) => {
+        queue.push({task, resolve, reject});
+        next();
+    });
+}
+
+// Fetches all apiUrls concurrently, at most `concurrency` at a time, and reports every url's outcome
+// in one callback: [{apiUrl, data} | {apiUrl, error}, ...] in the order of apiUrls.
+function fetchApiUrls(args) {
+    const {
+        apiUrls, concurrency = apiUrls.length, download_to_filename, transport = 'download', chunkSize, callback
+    } = args;
+    try {
+        const limit = createLimiter(concurrency);
+        Promise.allSettled(apiUrls.map(apiUrl => limit(() => fetch(apiUrl).then(response => response.json()))))
+            .then(outcomes => {
+                const results = outcomes.map((outcome, index) => (
+                    outcome.status === 'fulfilled'
+                        ? {apiUrl: apiUrls[index], data: outcome.value}
+                        : {apiUrl: apiUrls[index], error: String(outcome.reason && outcome.reason.message || outcome.reason)}
+                ));
+
+                if (transport === 'callback') {
+                    callback(packCallbackPayload(results, chunkSize)); // Success callback
+                } else {
+                    downloadJson(results, download_to_filename);
+                    callback({data: results}); // Success callback
+                }
+            });
+    } catch (error) {
+        callback({error: error.message}); // Error in fetchApiUrls
+    }
+}
+
+// Installed as the versioned window.__breadcrumbs namespace, which invocations call into.
+const breadcrumbsHelpers = {getApiUrl, fetchBreadcrumbsBookmarklet, fetchBreadcrumbs, fetchApiUrl, fetchApiUrls};
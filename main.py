@@ -1,9 +1,12 @@
 import asyncio
 import logging
 import sys
+import time
+from typing import Optional
 
 import structlog
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.security import APIKeyHeader
 
 from api import process_checklist
@@ -11,12 +14,19 @@ from config.config import (
     API_KEY_NAME, API_KEY_VALUE, BROWSER_START_URL, BROWSER_START_URL_LOADING_ELEMENT_SELECTOR,
     DRIVER_INITIALIZATION_TIMEOUT,
     BROWSER_DOWNLOAD_DIRECTORY, TEST_FETCH_BREADCRUMBS_URL, get_settings, update_settings, TRACKER_CHECKLIST_ISSUE_ID,
-    TRACKER_BREADCRUMBS_ERROR_KEY, DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME, get_settings_sync, ConfigModel)
-from utils.browser_manager import BreadcrumbsBrowserManager
+    TRACKER_BREADCRUMBS_ERROR_KEY, DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME, get_settings_sync, ConfigModel,
+    STANDBY_DEBUGGING_BROWSER_PORT, STANDBY_BROWSER_USER_DATA_DIR, ROOT_DIR)
+from utils.browser_manager import BreadcrumbsBrowserManager, WARM_UP_JS
+from utils.cdp_engine import CdpBreadcrumbsBrowserManager
 from utils.log import LoggerUtils, LastLogSafeCaptureProcessor, \
     last_log_safe_capture_processor
-from utils.process_issue import set_listitem_done_status
-from utils.tracker import get_issue, process_checklist_items
+from utils.pierce_api import preprocess_url
+from utils.process_issue import set_listitem_done_status, issue_patch_stats, create_checklist_update_buffer
+from utils.resource_store import ResourceStore
+from utils.tracker import get_issue, process_checklist_items, CHECKLIST_ISSUE_FIELDS, ITEM_ISSUE_FIELDS
+from utils.tracker_client import tracker_http_client
+from utils.tracker_write_planner import tracker_write_planner
+from utils.utils import exception_to_str
 
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
@@ -45,15 +55,32 @@ structlog.configure(
     cache_logger_on_first_use=True,
 )
 
-browser_manager = BreadcrumbsBrowserManager(
+browser_manager_class = {
+    'selenium': BreadcrumbsBrowserManager,
+    'cdp': CdpBreadcrumbsBrowserManager,
+}[get_settings_sync()['browser_engine']]
+resource_store = ResourceStore(
+    path=str(ROOT_DIR / get_settings_sync()['resource_store_path']),
+    max_entries=get_settings_sync()['resource_store_max_entries']) if get_settings_sync()['resource_store_enabled'] else None
+browser_manager_kwargs = dict(
     start_url=BROWSER_START_URL,
     loading_element_selector=BROWSER_START_URL_LOADING_ELEMENT_SELECTOR,
     driver_initialization_timeout=DRIVER_INITIALIZATION_TIMEOUT,
+    driver_command_workers=get_settings_sync()['driver_command_workers'],
     browser_download_dir=BROWSER_DOWNLOAD_DIRECTORY,
-    test_fetch_from_external_api_url=TEST_FETCH_BREADCRUMBS_URL)
+    test_fetch_from_external_api_url=TEST_FETCH_BREADCRUMBS_URL,
+    tab_pool_size=get_settings_sync()['browser_tab_pool_size'],
+    resource_cache_max_entries=get_settings_sync()['resource_cache_max_entries'])
+browser_manager = browser_manager_class(**browser_manager_kwargs, resource_store=resource_store)
+standby_browser_manager = browser_manager_class(
+    **browser_manager_kwargs,
+    debugging_browser_port=STANDBY_DEBUGGING_BROWSER_PORT,
+    user_data_dir=STANDBY_BROWSER_USER_DATA_DIR) if STANDBY_DEBUGGING_BROWSER_PORT else None
 
 app = FastAPI()
 
+readiness = {'ready': False, 'phases': {}, 'error': None}
+
 
 @app.middleware("http")
 async def log_errors(request, call_next):
@@ -72,6 +99,20 @@ async def process_checklist_continuously():
         await asyncio.sleep(config['process_checklist_frequency_seconds'])
 
 
+async def refresh_content_index_continuously():
+    while True:
+        config = await get_settings()
+        if config['content_index_enabled']:
+            browser_manager.content_index.evict_unreferenced(config['content_index_max_age_seconds'])
+            # Crawling gives way to the fetches of issue processing: one resource at a time, none while any is waiting
+            if not browser_manager.live_fetches:
+                await browser_manager.content_index.crawl(
+                    browser_manager.fetch_resource_for_index,
+                    refresh_interval_seconds=config['content_index_refresh_interval_seconds'],
+                    concurrency=1, should_yield=lambda: browser_manager.live_fetches > 0)
+        await asyncio.sleep(config['content_index_crawl_interval_seconds'])
+
+
 async def get_api_key(api_key_header: str = Depends(api_key_header)):
     if api_key_header == API_KEY_VALUE:
         return api_key_header
@@ -105,16 +146,55 @@ async def get_settings_endpoint():
     return settings
 
 
+@app.get('/get_browser_stats', dependencies=[Depends(get_api_key)])
+async def get_browser_stats():
+    return {
+        'tab_pool': browser_manager.tab_pool.stats(),
+        'driver_commands': browser_manager.command_executor.stats(),
+        'fetches': browser_manager.fetch_stats(),
+    }
+
+
+@app.get('/get_tracker_client_stats', dependencies=[Depends(get_api_key)])
+async def get_tracker_client_stats():
+    return {**tracker_http_client.stats(), 'issue_patches': issue_patch_stats.stats(),
+            'write_planner': tracker_write_planner.stats()}
+
+
+@app.get('/get_resource_cache_stats', dependencies=[Depends(get_api_key)])
+async def get_resource_cache_stats():
+    return browser_manager.resource_cache_stats()
+
+
+@app.post('/invalidate_resource_cache', dependencies=[Depends(get_api_key)])
+async def invalidate_resource_cache(url: Optional[str] = None, resource_type: Optional[str] = None):
+    invalidated = await browser_manager.invalidate_resources(url=url, resource_type=resource_type)
+    LoggerUtils(__name__).log('resource_cache_invalidated', level=LoggerUtils.levels.INFO,
+                              url=url, resource_type=resource_type, invalidated=invalidated)
+    return {'invalidated': invalidated}
+
+
+def _report_unchecked_item(unchecked_item: dict):
+    LoggerUtils(__name__).log(
+        'issue_unchecked_successfully',
+        level=LoggerUtils.levels.INFO,
+        issue_id=unchecked_item['checklist_item_text'],
+        checklist_item_url=unchecked_item['checklist_item_url']
+    )
+
+
 @app.post('/uncheck_deferred_issues_with_clean_error_field', dependencies=[Depends(get_api_key)])
 async def uncheck_deferred_issues_with_clean_error_field():
-    checklist_issue = await get_issue(TRACKER_CHECKLIST_ISSUE_ID)
+    checklist_issue = await get_issue(TRACKER_CHECKLIST_ISSUE_ID, fields=CHECKLIST_ISSUE_FIELDS)
     checked_items = []
     unchecked_items = []
     errors = []
+    checklist_updates = create_checklist_update_buffer(await get_settings())
+    queued_unchecked_items = []
 
     for checklist_item in checklist_issue.checklistItems:
         try:
-            issue = await get_issue(checklist_item.text)
+            issue = await get_issue(checklist_item.text, fields=ITEM_ISSUE_FIELDS)
         except HTTPException as e:
             error_message = (
                 'Issue could not be retrieved, probably because the listitem text '
@@ -135,7 +215,8 @@ async def uncheck_deferred_issues_with_clean_error_field():
             if not checklist_item.checked:
                 await set_listitem_done_status(
                     checklist_item_id=checklist_item.id, done=True,
-                    deadline_datetime=DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME
+                    deadline_datetime=DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME,
+                    updates=checklist_updates
                 )
                 checked_items.append({
                     'checklist_item_id': checklist_item.id,
@@ -148,19 +229,35 @@ async def uncheck_deferred_issues_with_clean_error_field():
         if not error_field_value and checklist_item.deadline and checklist_item.deadline.date >= DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME:
             # Uncheck the issue in the checklist
             checklist_item_url, checklist_patch_response = await set_listitem_done_status(
-                checklist_item_id=checklist_item.id, done=False
-            )
-            LoggerUtils(__name__).log(
-                'issue_unchecked_successfully',
-                level=LoggerUtils.levels.INFO,
-                issue_id=checklist_item.text,
-                checklist_item_url=checklist_item_url
+                checklist_item_id=checklist_item.id, done=False, updates=checklist_updates
             )
-            unchecked_items.append({
+            unchecked_item = {
                 'checklist_item_id': checklist_item.id,
                 'checklist_item_text': checklist_item.text,
                 'checklist_item_url': checklist_item_url
+            }
+            if checklist_updates is not None:
+                # Only queued so far, reported once flushed
+                queued_unchecked_items.append(unchecked_item)
+            else:
+                _report_unchecked_item(unchecked_item)
+                unchecked_items.append(unchecked_item)
+
+    if checklist_updates is not None and checklist_updates.pending:
+        failed_items = await checklist_updates.flush()
+        for (checklist_item_id, status_code) in failed_items.items():
+            LoggerUtils(__name__).log(
+                'failed_to_patch_checklist_item', level=LoggerUtils.levels.ERROR,
+                checklist_item_id=checklist_item_id, status_code=status_code)
+            errors.append({
+                'checklist_item_id': checklist_item_id,
+                'error_message': f'The checklist item could not be updated (status code {status_code}).'
             })
+        # Items updated by the bulk request or by its per-item fallback
+        for unchecked_item in queued_unchecked_items:
+            if unchecked_item['checklist_item_id'] not in failed_items:
+                _report_unchecked_item(unchecked_item)
+                unchecked_items.append(unchecked_item)
 
     return {
         'unchecked_items': unchecked_items,
@@ -180,7 +277,58 @@ async def uncheck_deferred_issues_continuously():
         await asyncio.sleep(config['uncheck_deferred_issues_frequency_seconds'])
 
 
-@app.on_event("startup")
-async def startup():
+async def warm_up():
+    """Starts the browser and readies the driver, page, tabs and Pierce session,
+    so that the first checklist run does not pay for it."""
+    phases = {
+        'driver': lambda: browser_manager.command_executor.run(browser_manager.get_driver),
+        'js_helpers': lambda: browser_manager.execute_js_with_injection_async(WARM_UP_JS),
+        'tab_pool': browser_manager.tab_pool.warm_up,
+        'session': lambda: browser_manager.fetch_from_external_api_async(
+            preprocess_url(TEST_FETCH_BREADCRUMBS_URL), url_source='warm_up'),
+    }
+    for (phase, run_phase) in phases.items():
+        started_at = time.monotonic()
+        await run_phase()
+        readiness['phases'][phase] = round(time.monotonic() - started_at, 3)
+        LoggerUtils(__name__).log('warm_up_phase_completed', level=LoggerUtils.levels.INFO,
+                                  phase=phase, duration_seconds=readiness['phases'][phase])
+
+
+async def warm_up_and_start_loops():
+    while not readiness['ready']:
+        try:
+            await warm_up()
+        except Exception as e:
+            LoggerUtils(__name__).log('warm_up_failed', level=LoggerUtils.levels.ERROR, e=e)
+            readiness['error'] = exception_to_str(e)
+            await asyncio.sleep((await get_settings())['browser_health_probe_interval_seconds'])
+        else:
+            readiness.update(ready=True, error=None)
     asyncio.create_task(process_checklist_continuously())
     asyncio.create_task(uncheck_deferred_issues_continuously())
+    asyncio.create_task(refresh_content_index_continuously())
+
+
+@app.get('/ready')
+async def ready():
+    """Readiness probe: responds with 503 until the warm-up has completed."""
+    return JSONResponse(readiness, status_code=200 if readiness['ready'] else 503)
+
+
+@app.on_event("startup")
+async def startup():
+    if standby_browser_manager:
+        browser_manager.attach_standby(standby_browser_manager)
+    asyncio.create_task(browser_manager.probe_health_continuously())
+    asyncio.create_task(warm_up_and_start_loops())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await browser_manager.aclose()
+    if standby_browser_manager:
+        await standby_browser_manager.aclose()
+    if resource_store:
+        resource_store.close()
+    await tracker_http_client.aclose()
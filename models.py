@@ -1,4 +1,5 @@
-from typing import List
+from functools import lru_cache
+from typing import Any, FrozenSet, List
 from typing import Optional
 
 from pydantic import BaseModel
@@ -22,6 +23,8 @@ class IssueData(BaseModel):
     key: str
     checklist_item_id: str
     done: bool = False
+    # The API URL of the link, if it was classified along with the rest of the checklist
+    api_url: Optional[str] = None
 
 
 class ProcessIssueRequest(BaseModel):
@@ -47,14 +50,23 @@ class ChecklistItem(BaseModel):
         return values
 
 
-def create_issue_model():
+ISSUE_FIELDS = {
+    TRACKER_LINK_KEY: (Optional[str], None),
+    TRACKER_BREADCRUMBS_ERROR_KEY: (Optional[str], None),
+    'key': (Optional[str], None),
+    'checklistItems': (List['ChecklistItem'], []),
+}
+
+
+@lru_cache(maxsize=None)
+def create_issue_model(fields: Optional[FrozenSet[str]] = None):
+    """Returns the model of an issue with all ISSUE_FIELDS, or a slim one with the given fields only.
+    Fields other than ISSUE_FIELDS are not validated."""
     dynamic_model = create_model(
         'DynamicChecklistResponse',
         **{
-            TRACKER_LINK_KEY: (Optional[str], None),
-            TRACKER_BREADCRUMBS_ERROR_KEY: (Optional[str], None),
-            'key': (Optional[str], None),
-            'checklistItems': (List['ChecklistItem'], [])
+            field: ISSUE_FIELDS.get(field, (Optional[Any], None))
+            for field in (ISSUE_FIELDS if fields is None else sorted(fields))
         },
         __base__=BaseModel
     )
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# config.config requires these at import; placeholders do for tests that reach neither the browser nor the tracker
+REQUIRED_ENVIRONMENT = {
+    'BROWSER_START_URL': 'http://localhost/',
+    'BROWSER_START_URL_LOADING_ELEMENT_SELECTOR': '.loading',
+    'DRIVER_INITIALIZATION_TIMEOUT': '5',
+    'TRACKER_PATCH_TIMEOUT': '5',
+    'BROWSER_DOWNLOAD_DIRECTORY': '/tmp',
+    'TEST_FETCH_BREADCRUMBS_URL': 'http://localhost/content/tasks/test/',
+    'API_KEY_NAME': 'BREADCRUMBS_API_KEY',
+    'API_KEY_VALUE': 'test',
+    'ISSUE_URL': 'http://localhost/v2/issues/{issue_id}',
+    'TEST_URLS': "['http://localhost/content/tasks/test/']",
+    'TRACKER_CHECKLIST_ISSUE_ID': 'TEST-1',
+    'TRACKER_LINK_KEY': 'link',
+    'TRACKER_BREADCRUMBS_ERROR_KEY': 'breadcrumbsError',
+    'DEFERRED_CHECKLIST_ITEMS_FUTURE_DATETIME': '2099-01-01T05:00:00.000+0000',
+    'DEBUGGING_BROWSER_PORT': '9222',
+    'DRIVER_SERVICE': sys.executable,
+}
+for (name, value) in REQUIRED_ENVIRONMENT.items():
+    os.environ.setdefault(name, value)
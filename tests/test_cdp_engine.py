@@ -0,0 +1,194 @@
+import asyncio
+import json
+import re
+
+import pytest
+import websockets
+
+from config.config import get_settings_sync
+from utils.cdp_engine import CdpBreadcrumbsBrowserManager, CdpConnection
+
+
+async def run_with_fake_cdp_endpoint(handle_connection, run_client):
+    """Runs run_client(websocket_url) against a local websocket server acting as a CDP target."""
+    async with websockets.serve(handle_connection, 'localhost', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        return await run_client(f'ws://localhost:{port}/devtools/page/TEST')
+
+
+def test_concurrent_commands_answered_out_of_order():
+    async def answer_in_reverse(websocket):
+        commands = [json.loads(await websocket.recv()) for _ in range(3)]
+        # An event, which carries no id, is interleaved with the responses
+        await websocket.send(json.dumps({'method': 'Page.loadEventFired', 'params': {}}))
+        for command in reversed(commands):
+            await websocket.send(json.dumps({'id': command['id'], 'result': {'method': command['method']}}))
+        await websocket.wait_closed()
+
+    async def send_concurrently(websocket_url):
+        connection = CdpConnection(websocket_url)
+        try:
+            return await asyncio.gather(*(
+                connection.send(method, timeout=5) for method in ('Runtime.enable', 'Page.enable', 'DOM.enable')))
+        finally:
+            await connection.close()
+
+    results = asyncio.run(run_with_fake_cdp_endpoint(answer_in_reverse, send_concurrently))
+    assert results == [{'method': 'Runtime.enable'}, {'method': 'Page.enable'}, {'method': 'DOM.enable'}]
+
+
+def test_error_response_raises_for_its_command_only():
+    async def answer_with_error(websocket):
+        async for message in websocket:
+            command = json.loads(message)
+            if command['method'] == 'Page.navigate':
+                await websocket.send(json.dumps(
+                    {'id': command['id'], 'error': {'code': -32000, 'message': 'Cannot navigate to invalid URL'}}))
+            else:
+                await websocket.send(json.dumps({'id': command['id'], 'result': {'ok': True}}))
+
+    async def send_failing_and_succeeding(websocket_url):
+        connection = CdpConnection(websocket_url)
+        try:
+            with pytest.raises(RuntimeError, match='cdp_command_error'):
+                await connection.send('Page.navigate', {'url': 'invalid'}, timeout=5)
+            # The connection stays usable
+            return await connection.send('Runtime.enable', timeout=5)
+        finally:
+            await connection.close()
+
+    assert asyncio.run(run_with_fake_cdp_endpoint(answer_with_error, send_failing_and_succeeding)) == {'ok': True}
+
+
+def test_connection_dropped_mid_command_fails_pending_commands_and_reconnects():
+    connections = []
+
+    async def drop_first_connection(websocket):
+        connections.append(websocket)
+        async for message in websocket:
+            command = json.loads(message)
+            if len(connections) == 1:
+                if command['method'] == 'DOM.enable':
+                    await websocket.send(json.dumps({'id': command['id'], 'result': {}}))
+                # Both commands are received before the connection drops without an answer
+                elif command['method'] == 'Page.enable':
+                    await websocket.close()
+            else:
+                await websocket.send(json.dumps({'id': command['id'], 'result': {'reconnected': True}}))
+
+    async def send_through_drop(websocket_url):
+        connection = CdpConnection(websocket_url)
+        try:
+            await connection.send('DOM.enable', timeout=5)
+            connection.registered_helpers = ('version', 'identifier')
+            outcomes = await asyncio.gather(
+                connection.send('Runtime.enable', timeout=5), connection.send('Page.enable', timeout=5),
+                return_exceptions=True)
+            assert not connection.is_open
+            result_after_reconnect = await connection.send('Runtime.enable', timeout=5)
+            # The helpers registered over the dropped connection went with its session
+            assert connection.registered_helpers is None
+            return outcomes, result_after_reconnect
+        finally:
+            await connection.close()
+
+    (outcomes, result_after_reconnect) = asyncio.run(run_with_fake_cdp_endpoint(drop_first_connection, send_through_drop))
+    assert all(isinstance(outcome, RuntimeError) and 'cdp_connection_closed' in str(outcome) for outcome in outcomes)
+    assert result_after_reconnect == {'reconnected': True}
+    assert len(connections) == 2
+
+
+class FakeDriver:
+    """Stands for the driver of the manager's own tab, whose CDP target is TEST."""
+
+
+def create_browser_manager(websocket_url: str) -> CdpBreadcrumbsBrowserManager:
+    browser_manager = CdpBreadcrumbsBrowserManager(
+        'http://localhost/', '.loading', 5, browser_download_dir='/tmp',
+        test_fetch_from_external_api_url='http://localhost/content/tasks/test/', max_concurrent_evaluations=4)
+    driver = FakeDriver()
+    browser_manager.get_driver = lambda: driver
+    browser_manager._target_ids[driver] = 'TEST'
+    browser_manager._connections['TEST'] = CdpConnection(websocket_url)
+    return browser_manager
+
+
+@pytest.fixture
+def settings():
+    settings = get_settings_sync()
+    initial_settings = dict(settings)
+    settings.update(fetch_transport='callback', callback_transport_chunk_size=16, direct_http_fetch=False)
+    yield settings
+    settings.update(initial_settings)
+
+
+def test_fetch_installs_missing_helpers_and_reads_chunked_payload(settings):
+    payload = {'name': 'A resource with a name longer than a chunk'}
+    serialized_payload = json.dumps(payload)
+    methods = []
+
+    async def answer_like_page(websocket):
+        helpers_installed = False
+        async for message in websocket:
+            command = json.loads(message)
+            methods.append(command['method'])
+            expression = command['params'].get('expression', '')
+            chunk_read = re.search(r'\.slice\((\d+), (\d+)\)', expression)
+            if command['method'] == 'Page.addScriptToEvaluateOnNewDocument':
+                result = {'identifier': '1'}
+            elif 'breadcrumbsHelpers' in expression:
+                helpers_installed = True
+                result = {'result': {'type': 'undefined'}}
+            elif chunk_read:
+                result = {'result': {'value': serialized_payload[int(chunk_read[1]):int(chunk_read[2])]}}
+            elif expression.startswith('delete'):
+                result = {'result': {'value': True}}
+            elif helpers_installed:
+                chunked = {'payloadId': 'p1', 'length': len(serialized_payload), 'chunkSize': 16}
+                result = {'result': {'value': {'chunked': chunked}}}
+            else:
+                result = {'result': {'value': {'helpersMissing': True}}}
+            await websocket.send(json.dumps({'id': command['id'], 'result': result}))
+
+    async def fetch(websocket_url):
+        browser_manager = create_browser_manager(websocket_url)
+        try:
+            data = await browser_manager._fetch_uncached_async(
+                'http://localhost/content/topics/tp1/', 'test', settings)
+            return data, browser_manager._connections['TEST'].registered_helpers
+        finally:
+            await browser_manager.aclose()
+
+    (data, registered_helpers) = asyncio.run(run_with_fake_cdp_endpoint(answer_like_page, fetch))
+    assert data == payload
+    assert registered_helpers[1] == '1'
+    chunk_count = -(-len(serialized_payload) // 16)
+    # Guarded invocation, registration and installation, invocation again, then the chunks and their release
+    assert methods == (['Runtime.evaluate', 'Page.addScriptToEvaluateOnNewDocument'] + ['Runtime.evaluate'] * 2
+                       + ['Runtime.evaluate'] * (chunk_count + 1))
+
+
+def test_concurrent_fetches_share_the_connection_without_checking_out_tabs(settings):
+    fetch_count = 3
+
+    async def answer_once_all_arrived(websocket):
+        # Answering only once every fetch is evaluated proves they are in flight together on one tab.
+        # The helpers are taken as installed, so every fetch is a single evaluation.
+        commands = [json.loads(await websocket.recv()) for _ in range(fetch_count)]
+        for command in commands:
+            api_url = re.search(r'"apiUrl": "([^"]+)"', command['params']['expression'])[1]
+            result = {'result': {'value': {'data': {'url': api_url}}}}
+            await websocket.send(json.dumps({'id': command['id'], 'result': result}))
+        await websocket.wait_closed()
+
+    async def fetch_concurrently(websocket_url):
+        browser_manager = create_browser_manager(websocket_url)
+        try:
+            return await asyncio.wait_for(asyncio.gather(*(
+                browser_manager._fetch_uncached_async(f'http://localhost/content/topics/tp{index}/', 'test', settings)
+                for index in range(fetch_count))), timeout=5)
+        finally:
+            await browser_manager.aclose()
+
+    results = asyncio.run(run_with_fake_cdp_endpoint(answer_once_all_arrived, fetch_concurrently))
+    assert results == [{'url': f'http://localhost/content/topics/tp{index}/'} for index in range(fetch_count)]
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from config.config import get_settings_sync
+from models import IssueData
+from utils.browser_manager import BreadcrumbsBrowserManager
+from utils.pierce_api import build_resource_url, classify_url, postprocess_fetched_data
+from utils.utils import ErrorList
+
+LEVEL_LATENCY_SECONDS = 0.2
+
+# The payload of a task's endpoint points at all of its ancestors
+TASK_PAYLOAD = {
+    'lesson_id': 'l1', 'topic_id': 'tp1', 'sprint_id': '7', 'course_id': 'c1',
+    'track_id': 'tr1', 'profession_id': 'p1', 'faculty_id': 'f1',
+}
+
+LEVELS_FROM_THE_TOP = ['faculty', 'profession', 'track', 'course', 'sprint', 'topic', 'lesson', 'task']
+
+
+class FakeDriver:
+    """Stands for the driver of the pool's only tab."""
+
+
+def create_browser_manager() -> BreadcrumbsBrowserManager:
+    """A browser manager with a pool of one tab, whose page answers every url after a latency."""
+    browser_manager = BreadcrumbsBrowserManager(
+        'http://localhost/', '.loading', 5, browser_download_dir='/tmp',
+        test_fetch_from_external_api_url='http://localhost/content/tasks/test/', tab_pool_size=1)
+    driver = FakeDriver()
+    browser_manager.get_driver = lambda: driver
+    browser_manager.executed_scripts = []
+
+    async def fetch_in_page(api_url: str) -> dict:
+        # Deeper levels answer sooner, so that completion order differs from the hierarchy order
+        classification = classify_url(api_url)
+        await asyncio.sleep(LEVEL_LATENCY_SECONDS * (1 - 0.05 * LEVELS_FROM_THE_TOP.index(classification.resource)))
+        if classification.resource == 'task':
+            return {'description': 'Task description', 'position': 3, **TASK_PAYLOAD}
+        return {'name': f'{classification.resource} {classification.resource_id}'}
+
+    async def execute_fetch_js_async(js_method_name, js_args, err_context, _driver=None):
+        assert _driver is driver
+        browser_manager.executed_scripts.append(js_method_name)
+        if js_method_name == 'fetchApiUrl':
+            return await fetch_in_page(js_args['apiUrl'])
+        semaphore = asyncio.Semaphore(js_args['concurrency'])
+
+        async def fetch_with_limit(api_url):
+            async with semaphore:
+                return {'apiUrl': api_url, 'data': await fetch_in_page(api_url)}
+
+        return list(await asyncio.gather(*(fetch_with_limit(api_url) for api_url in js_args['apiUrls'])))
+
+    browser_manager._execute_fetch_js_async = execute_fetch_js_async
+    return browser_manager
+
+
+@pytest.fixture
+def settings():
+    settings = get_settings_sync()
+    initial_settings = dict(settings)
+    # Every level gets fetched through the browser, with no concurrency limit short of the number of levels
+    settings.update(hierarchy_fetch_concurrency=len(TASK_PAYLOAD) + 1, content_index_enabled=False,
+                    direct_http_fetch=False, resource_cache_ttl_seconds={})
+    yield settings
+    settings.update(initial_settings)
+
+
+def test_hierarchy_levels_resolve_concurrently_on_one_tab_and_keep_their_order(settings):
+    browser_manager = create_browser_manager()
+    url = build_resource_url('tasks', 't1')
+    issue = IssueData(link=url, key='TEST-2', checklist_item_id='item1')
+    errors = ErrorList()
+
+    async def resolve_issue():
+        try:
+            data = await browser_manager.fetch_from_external_api_async(url, 'test')
+            started_at = time.perf_counter()
+            result = await postprocess_fetched_data(
+                browser_manager, url, data, issue=issue, checklist_error_messages=errors)
+            return result, time.perf_counter() - started_at
+        finally:
+            await browser_manager.aclose()
+
+    (result, elapsed_seconds) = asyncio.run(resolve_issue())
+
+    level_count = len(TASK_PAYLOAD) + 1
+    # The issue's own fetch, then every level in a single script execution on the single tab
+    assert browser_manager.executed_scripts == ['fetchApiUrl', 'fetchApiUrls']
+    assert browser_manager.tab_pool.stats()['tabs'][0]['checkouts'] == 2
+    # About one level's latency, far from the sum of all levels' latencies
+    assert elapsed_seconds < 2 * LEVEL_LATENCY_SECONDS < level_count * LEVEL_LATENCY_SECONDS
+    assert not errors
+    assert list(result) == ['topic', 'sprint', 'course', 'track', 'profession', 'faculty', 'lesson', 'task']
+    assert [result[level]['name'] for level in ('topic', 'sprint', 'course', 'track', 'profession', 'faculty')] == [
+        'topic tp1', 'sprint 7', 'course c1', 'track tr1', 'profession p1', 'faculty f1']
+    assert result['lesson']['name'] == 'lesson l1'
+    assert (result['task']['description'], result['task']['position']) == ('Task description', 3)
@@ -1,22 +1,24 @@
 import asyncio
+import functools
+import hashlib
 import json
 import os
 import pathlib
-import subprocess
+import sqlite3
 import sys
-import threading
 import time
-import traceback
+import weakref
 import uuid
+from contextlib import asynccontextmanager
 from queue import Queue, Empty
 from threading import Thread, Lock
-from typing import Union
+from typing import Union, List, Dict, Tuple, Optional, Set
 
 import aiofiles
-import psutil
+import httpx
 from dotenv import load_dotenv
 from selenium import webdriver
-from selenium.common import WebDriverException
+from selenium.common import WebDriverException, TimeoutException
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.webdriver import WebDriver
@@ -24,31 +26,108 @@ from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 
 from config.config import get_settings_sync, get_settings, DRIVER_SERVICE, \
-    DEBUGGING_BROWSER_PORT, BROWSER_TYPE, BROWSER_PATH, RUN_BROWSER_LOCALLY, \
-    BROWSER_PROCESS_NAME
+    DEBUGGING_BROWSER_PORT, BROWSER_TYPE, BROWSER_PATH, RUN_BROWSER_LOCALLY
+from utils.browser_pool import BrowserTabPool
+from utils.browser_supervisor import BrowserSupervisor
+from utils.content_index import ContentIndex
+from utils.driver_executor import DriverCommandExecutor
+from utils.file_waiter import FileArrivalWaiter
 from utils.log import LoggerUtils
-from utils.pierce_api import preprocess_url
-from utils.utils import str2bool, ThreadResult
+from utils.negative_cache import NegativeCache
+from utils.pierce_api import (
+    preprocess_url, identify_resource, is_error_payload, classify_url, build_resource_url, get_resource_plural_name)
+from utils.pierce_http import PierceHttpClient
+from utils.resource_cache import ResourceCache
+from utils.resource_store import ResourceStore
+from utils.utils import exception_to_str
 
 load_dotenv()
 
+FETCH_TRANSPORT_CALLBACK = 'callback'
+FETCH_TRANSPORT_DOWNLOAD = 'download'
+
+# Lets the driver-side script timeout fire before the awaiting side gives up.
+DRIVER_COMMAND_TIMEOUT_GRACE_SECONDS = 1
+
+# Fields of a cookie from Network.getAllCookies accepted back by Network.setCookies
+CDP_COOKIE_PARAM_KEYS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires', 'priority')
+
+# The helpers from the injection file are installed once per page as the window.__breadcrumbs namespace;
+# every invocation first checks that the namespace is there and up to date.
+JS_HELPERS_INSTALLER_TEMPLATE = (
+    "(function () {{\n"
+    "{source}\n"
+    "window.__breadcrumbs = Object.assign({{}}, breadcrumbsHelpers, {{version: {version}}});\n"
+    "}})();\n"
+)
+JS_HELPERS_GUARD_TEMPLATE = (
+    "if (!window.__breadcrumbs || window.__breadcrumbs.version !== {version}) {{\n"
+    "    arguments[arguments.length - 1]({{helpersMissing: true}});\n"
+    "    return;\n"
+    "}}\n"
+)
+
+# Does nothing but makes the guard install the helpers into the page
+WARM_UP_JS = 'arguments[arguments.length - 1]({});'
+
+READ_PAYLOAD_CHUNK_JS = 'return window.__breadcrumbsPayloads[arguments[0]].slice(arguments[1], arguments[2]);'
+RELEASE_PAYLOAD_JS = 'delete window.__breadcrumbsPayloads[arguments[0]];'
+
+
+def to_cdp_cookie_param(cookie: dict) -> dict:
+    cookie_param = {key: value for (key, value) in cookie.items() if key in CDP_COOKIE_PARAM_KEYS}
+    if cookie.get('session'):
+        # Session cookies are reported with a negative expiration date
+        cookie_param.pop('expires', None)
+    return cookie_param
+
+
+@functools.lru_cache(maxsize=None)
+def load_js_helpers(injection_file: str) -> Tuple[str, str]:
+    """Reads the JS injection file once, returning its source and a version derived from its content."""
+    with open(injection_file, 'r', encoding='utf-8') as f:
+        source = f.read()
+    return source, hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+
+
+def is_page_fetch_error(e: Exception) -> bool:
+    """Whether the in-page fetch reported an error for its url, as opposed to the browser, the driver
+    or the transport failing, which says nothing about the url."""
+    return any(str(error) == 'js_error' for error in (e, *getattr(e, 'original_exceptions', [])))
+
 
 class BrowserManager:
+    # Attributes tied to a browser instance, exchanged with the standby on failover
+    _instance_state_attrs = ('_driver', 'debugging_browser_port', 'user_data_dir', 'supervisor',
+                             '_script_timeouts', '_js_helpers_registrations')
+
     def __init__(self, start_url: str, loading_element_selector: str,
-                 driver_initialization_timeout: int):
+                 driver_initialization_timeout: int, driver_command_workers: int = 4,
+                 debugging_browser_port: Optional[int] = None, user_data_dir: Optional[str] = None):
         self.browser_path = BROWSER_PATH
         self.browser_type = BROWSER_TYPE
-        self.browser_process_name = BROWSER_PROCESS_NAME
         self.run_browser_locally = RUN_BROWSER_LOCALLY
-        self.debugging_browser_port = DEBUGGING_BROWSER_PORT
+        self.debugging_browser_port = debugging_browser_port or DEBUGGING_BROWSER_PORT
+        # None runs the browser with its default profile
+        self.user_data_dir = user_data_dir
+        self.supervisor = BrowserSupervisor(self.debugging_browser_port)
 
         self.driver_initialization_timeout = driver_initialization_timeout
         self.start_url = start_url
         self.loading_element_selector = loading_element_selector
         self._driver = None
         self._driver_lock = Lock()
+        self._last_health_signal_at = None
+        self._script_timeouts = weakref.WeakKeyDictionary()
+        # The version and identifier of the helpers registered for new documents, by driver
+        self._js_helpers_registrations = weakref.WeakKeyDictionary()
+        self.command_executor = DriverCommandExecutor(max_workers=driver_command_workers)
+        self.standby: Optional['BrowserManager'] = None
+        self.standby_ready = False
+        # The manager whose session cookies a standby imports into its freshly started browser
+        self.cookie_source: Optional['BrowserManager'] = None
 
-    def _is_page_responsive(self, raise_if_irresponsive=False) -> bool:
+    def _is_page_responsive(self, raise_if_irresponsive=False, _driver=None) -> bool:
         """
         Synchronous method to check if a page is responsive.
         Override in the subclass with specific logic.
@@ -57,20 +136,153 @@ class BrowserManager:
         raise NotImplementedError
 
     def get_driver(self) -> WebDriver:
+        """Returns the driver straight away while it is known to be healthy,
+        otherwise checks the page and re-initializes the driver if needed.
+        With a warm standby, an unresponsive browser is swapped for the standby instead."""
         with self._driver_lock:
+            if self._driver and self._is_health_fresh():
+                return self._driver
+
             if self._driver:
-                if not self._is_page_responsive():
+                check_started_at = time.monotonic()
+                # A browser which exited under us is not worth a page check
+                if self.supervisor.crashed or not self._is_page_responsive():
                     try:
                         self._driver.close()
                     except Exception as e:
                         LoggerUtils(__name__).log('driver_close_error', level=LoggerUtils.levels.ERROR, e=e)
                     self._driver = None
+                    self._fail_over_to_standby(check_started_at)
 
             if not self._driver:
                 self._initialize_driver()
 
+            self.record_health_signal()
             return self._driver
 
+    def attach_standby(self, standby: 'BrowserManager'):
+        """Keeps a second browser instance warm to switch to when this one stops responding."""
+        self.standby = standby
+        standby.cookie_source = self
+        self._warm_up_standby_in_background()
+
+    def _warm_up_standby_in_background(self):
+        Thread(target=self._warm_up_standby, name='standby-browser-warm-up', daemon=True).start()
+
+    def _warm_up_standby(self):
+        """(Re)builds the standby if needed and checks that its page is responsive."""
+        started_at = time.monotonic()
+        try:
+            self.standby.invalidate_health()
+            self.standby.get_driver()
+        except Exception as e:
+            self.standby_ready = False
+            LoggerUtils(__name__).log('standby_browser_warm_up_failed', level=LoggerUtils.levels.ERROR, e=e,
+                                      port=self.standby.debugging_browser_port)
+        else:
+            self.standby_ready = True
+            LoggerUtils(__name__).log('standby_browser_ready', level=LoggerUtils.levels.INFO,
+                                      port=self.standby.debugging_browser_port,
+                                      warm_up_seconds=round(time.monotonic() - started_at, 3))
+
+    def _fail_over_to_standby(self, check_started_at: float) -> bool:
+        """Swaps the failed browser instance for the warm standby, then rebuilds the failed one as the new standby."""
+        if not self.standby or not self.standby_ready:
+            return False
+        # A standby which is being warmed up is not switched to
+        if not self.standby._driver_lock.acquire(blocking=False):
+            return False
+        switch_started_at = time.monotonic()
+        try:
+            for attr in self._instance_state_attrs:
+                (own_value, standby_value) = (getattr(self, attr), getattr(self.standby, attr))
+                setattr(self, attr, standby_value)
+                setattr(self.standby, attr, own_value)
+            self.standby_ready = False
+            self.standby.invalidate_health()
+        finally:
+            self.standby._driver_lock.release()
+        switched_at = time.monotonic()
+        LoggerUtils(__name__).log(
+            'failed_over_to_standby_browser', level=LoggerUtils.levels.WARNING,
+            port=self.debugging_browser_port, failed_port=self.standby.debugging_browser_port,
+            detection_seconds=round(switch_started_at - check_started_at, 3),
+            switch_seconds=round(switched_at - switch_started_at, 3))
+        self._warm_up_standby_in_background()
+        return True
+
+    def _is_health_fresh(self) -> bool:
+        if self._last_health_signal_at is None or self.supervisor.crashed:
+            return False
+        health_ttl = get_settings_sync()['browser_health_ttl_seconds']
+        return time.monotonic() - self._last_health_signal_at < health_ttl
+
+    def record_health_signal(self, _driver=None):
+        """Marks the driver as known-healthy, e.g. after a check or a successful real fetch.
+        Signals from drivers other than the manager's own are ignored."""
+        if _driver is None or _driver is self._driver:
+            self._last_health_signal_at = time.monotonic()
+
+    def invalidate_health(self, _driver=None):
+        """Makes the next get_driver() check the page before handing out the driver."""
+        if _driver is None or _driver is self._driver:
+            self._last_health_signal_at = None
+
+    def _probe_health(self):
+        """Checks the page of the current driver without holding the driver lock, so that get_driver()
+        keeps handing the driver out meanwhile. The lock is only taken to replace a driver failing the check."""
+        _driver = self._driver
+        if _driver is not None and not self.supervisor.crashed and self._is_page_responsive(_driver=_driver):
+            self.record_health_signal(_driver)
+            return
+        self.invalidate_health(_driver)
+        self.get_driver()
+
+    async def probe_health_continuously(self):
+        """Keeps the health state fresh in the background, so that get_driver() does not have to check the page.
+        A probe is skipped while real fetches keep reporting the driver healthy.
+        The standby browser, if any, is checked on every round."""
+        while True:
+            config = await get_settings()
+            interval = config['browser_health_probe_interval_seconds']
+            await asyncio.sleep(interval)
+            if self._last_health_signal_at is None or time.monotonic() - self._last_health_signal_at >= interval:
+                await self._probe_own_health()
+            if self.standby:
+                # The standby is another browser, so it is not probed on the driver command executor
+                await asyncio.to_thread(self._warm_up_standby)
+
+    async def _probe_own_health(self):
+        started_at = time.monotonic()
+        try:
+            await self.command_executor.run(self._probe_health)
+        except Exception as e:
+            LoggerUtils(__name__).log('browser_health_probe_failed', level=LoggerUtils.levels.ERROR, e=e)
+        else:
+            LoggerUtils(__name__).log('browser_health_probe_passed', level=LoggerUtils.levels.DEBUG,
+                                      duration_seconds=round(time.monotonic() - started_at, 3))
+
+    def create_tab_driver(self) -> WebDriver:
+        """Attach an extra driver session to the running browser and give it a tab of its own at start_url."""
+        self.get_driver()  # Makes sure the browser is running
+        driver_service = Service(executable_path=DRIVER_SERVICE)
+        options = self._get_browser_options(self.browser_type)
+        (driver, thread_to_get_driver) = self._get_driver_in_thread(driver_service, options)
+        if not driver:
+            raise LoggerUtils(__name__).create_exception('tab_driver_initialization_failure', RuntimeError, log=True)
+        thread_to_get_driver.join()
+        driver.switch_to.new_window('tab')
+        driver.get(self.start_url)
+        return driver
+
+    def close_tab_driver(self, driver: WebDriver):
+        """Close the tab of a driver created by create_tab_driver and end its session."""
+        try:
+            driver.close()
+            driver.quit()
+        except Exception as e:
+            LoggerUtils(__name__).log('driver_close_error', level=LoggerUtils.levels.ERROR, e=e)
+
     def _get_driver_in_thread(self, driver_service, options):
         driver_queue = Queue()
         driver_thread = Thread(target=self._init_driver, args=(driver_queue, driver_service, options))
@@ -99,20 +311,46 @@ class BrowserManager:
                 self._start_browser()
             driver_service = Service(executable_path=DRIVER_SERVICE)
             (self._driver, thread_to_get_driver) = self._get_driver_in_thread(driver_service, options)
+            self._prepare_new_driver()
             if not self._driver or not self._is_page_responsive():
+                if self.supervisor.is_debugging_port_held_by_other_process():
+                    # A browser started next to it would not get the port, leaving the unresponsive one attached to
+                    raise LoggerUtils(__name__).create_exception(
+                        'debugging_port_held_by_unowned_browser', RuntimeError, log=True,
+                        port=self.debugging_browser_port,
+                        detail='The browser on the debugging port was not started by the app '
+                               'and has to be restarted by whoever started it.')
                 self._kill_browser_processes()
                 self._start_browser()
                 (self._driver, thread_to_get_driver) = self._get_driver_in_thread(driver_service, options)
+                self._prepare_new_driver()
             if not self._driver:
                 raise LoggerUtils(__name__).create_exception('driver_initialization_failure', RuntimeError, log=True)
             else:
                 thread_to_get_driver.join()
             self._is_page_responsive(raise_if_irresponsive=True)
+            self.supervisor.mark_recovered()
         else:
             raise LoggerUtils(__name__).create_exception('configuring_remote_driver_not_implemented', NotImplementedError, log=True, DRIVER_SERVICE=DRIVER_SERVICE)
         LoggerUtils(__name__).log('driver_initialized_successfully', level=LoggerUtils.levels.INFO)
         return self._driver
 
+    def _prepare_new_driver(self):
+        """Imports the session cookies of the cookie source, if any, into a newly attached browser."""
+        source_driver = self.cookie_source._driver if self.cookie_source else None
+        if not self._driver or not source_driver:
+            return
+        try:
+            cookies = source_driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+            self._driver.execute_cdp_cmd('Network.setCookies', {'cookies': [to_cdp_cookie_param(cookie) for cookie in cookies]})
+            self._driver.get(self.start_url)
+        except WebDriverException as e:
+            LoggerUtils(__name__).log('cookie_import_failed', level=LoggerUtils.levels.ERROR, e=e,
+                                      port=self.debugging_browser_port)
+        else:
+            LoggerUtils(__name__).log('cookies_imported', level=LoggerUtils.levels.INFO,
+                                      cookie_count=len(cookies), port=self.debugging_browser_port)
+
     def _init_driver(self, driver_queue, driver_service, options):
         try:
             driver = webdriver.Chrome(service=driver_service, options=options, keep_alive=True)
@@ -124,57 +362,16 @@ class BrowserManager:
             LoggerUtils(__name__).log('unexpected_error_initializing_driver', level=LoggerUtils.levels.ERROR, e=e)
             driver_queue.put(None)
 
-    def _is_browser_running(self):
-        running = False
-        try:
-            for process in psutil.process_iter(attrs=['name']):
-                process_name = process.info['name'].lower()
-                if self.browser_process_name in process_name:
-                    running = True
-                    break
-            return running
-        except Exception as e:
-            LoggerUtils(__name__).log('error_checking_browser_process', level=LoggerUtils.levels.ERROR, e=e)
-            return False
+    def _is_browser_running(self) -> bool:
+        """A browser is usable if the one we spawned is alive or something already listens on the debugging port."""
+        return self.supervisor.is_running() or self.supervisor.is_debugging_port_open()
 
-    async def _is_debugging_port_open(self):
-        cmd = f'netstat -tuln | grep ":{self.debugging_browser_port}"'
-        process = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE,
-                                                        stderr=asyncio.subprocess.PIPE)
-        (stdout, _) = await process.communicate()
-        return f':{self.debugging_browser_port}' in stdout.decode()
-        # Equivalent bash command for self.remote_debugging_port = 9222:
-        # PORT=9222; netstat -tuln | grep ":$PORT" > /dev/null && echo "Port is open" || echo "Port is closed"
+    def _is_debugging_port_open(self) -> bool:
+        return self.supervisor.is_debugging_port_open()
 
     def _kill_browser_processes(self, timeout_secs=10):
-        for process in psutil.process_iter(attrs=['name']):
-            if self.browser_process_name in process.info['name'].lower():
-                LoggerUtils(__name__).log(
-                    'killing_browser_process', level=LoggerUtils.levels.INFO, process=process.info['name'])
-
-                try:
-                    # Replaced subprocess.run(['kill', '-9', str(process.pid)]) with it's cross-platform equivalent
-                    p = psutil.Process(process.pid)
-                    p.terminate()  # or p.kill() for force termination
-                except psutil.NoSuchProcess:
-                    LoggerUtils(__name__).log('process_not_found',
-                                              level=LoggerUtils.levels.INFO,
-                                              process_id=process.pid)
-                except Exception as e:
-                    exc_context = {
-                        'process_id': process.pid, 'error_message': str(e)
-                    }
-                    raise LoggerUtils(__name__).create_exception(
-                        'process_termination_failed', RuntimeError,
-                        original_exception=e, **exc_context)
-
-                # Waiting for the process to terminate
-                try:
-                    process.wait(timeout=timeout_secs)
-                except psutil.TimeoutExpired:
-                    LoggerUtils(__name__).create_exception(
-                        'failed_to_kill_browser_process', TimeoutError, log=True,
-                        timeout=timeout_secs, process=process.info['name'])
+        """Stops the browser spawned by this manager; browsers started by anything else are left alone."""
+        self.supervisor.stop(timeout_secs)
 
     def _get_browser_options(self, browser_type: str):
         if browser_type == 'firefox':
@@ -187,92 +384,125 @@ class BrowserManager:
             # Port kept open after the request is processed
             # to save on the page loading time for the next request
             options.add_experimental_option(
-                'debuggerAddress', f'localhost:{DEBUGGING_BROWSER_PORT}')
+                'debuggerAddress', f'localhost:{self.debugging_browser_port}')
             return options
 
     def _start_browser(self):
         """Implemented synchronously, because the app is supposed to have
         a browser instance running."""
         LoggerUtils(__name__).log('starting_browser', level=LoggerUtils.levels.INFO, browser=self.browser_path, port=self.debugging_browser_port)
-        cmd = [self.browser_path, '--remote-debugging-port=' + str(self.debugging_browser_port), '--start-maximized', '--disable-infobars', self.start_url]
-        platform = sys.platform
-        if platform == 'win32':
-            subprocess.Popen(cmd, creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
-        elif platform == 'darwin':
-            subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-        else:  # Linux and other Unix-like
-            subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE, start_new_session=True)
-        if not self._is_browser_running():
-            raise LoggerUtils(__name__).create_exception('failed_to_start_browser', RuntimeError, log=True, platform=platform, browser=self.browser_path)
+        cmd = [self.browser_path, '--remote-debugging-port=' + str(self.debugging_browser_port), '--start-maximized', '--disable-infobars']
+        if self.user_data_dir:
+            cmd.append('--user-data-dir=' + str(self.user_data_dir))
+        cmd.append(self.start_url)
+        self.supervisor.start(cmd)
+        if not self.supervisor.wait_for_debugging_port(self.driver_initialization_timeout):
+            raise LoggerUtils(__name__).create_exception(
+                'failed_to_start_browser', RuntimeError, log=True, platform=sys.platform, browser=self.browser_path,
+                port=self.debugging_browser_port, running=self.supervisor.is_running())
 
     def _prepare_js_script(self, js_code_to_execute, injection_file='js_injection_funcs.js'):
-        """Reads the JS injection file and combines it with the given JS code."""
-        with open(injection_file, 'r', encoding='utf-8') as f:
-            js_functions = f.read()
-        full_script = js_functions + '\n' + js_code_to_execute
-        return full_script
+        """Prefixes the given JS code with a check that the page has the current version of the helpers installed."""
+        (_, version) = load_js_helpers(injection_file)
+        return JS_HELPERS_GUARD_TEMPLATE.format(version=json.dumps(version)) + js_code_to_execute
+
+    def _install_js_helpers(self, _driver, injection_file='js_injection_funcs.js'):
+        """Installs the helpers in the current page and, where the driver speaks CDP,
+        registers them to be installed in every document the tab loads from now on."""
+        (source, version) = load_js_helpers(injection_file)
+        installer = JS_HELPERS_INSTALLER_TEMPLATE.format(source=source, version=json.dumps(version))
+        if hasattr(_driver, 'execute_cdp_cmd'):
+            try:
+                self._register_js_helpers(_driver, installer, version)
+            except WebDriverException as e:
+                LoggerUtils(__name__).log('js_helpers_registration_failed', level=LoggerUtils.levels.WARNING, e=e)
+        _driver.execute_script(installer)
+        LoggerUtils(__name__).log('js_helpers_installed', level=LoggerUtils.levels.INFO, version=version)
+
+    def _register_js_helpers(self, _driver, installer: str, version: str):
+        """
+        The registration belongs to the DevTools session of the driver and is dropped when the session detaches,
+        so it is kept by driver: a re-attached driver registers the helpers again. An outdated registration
+        is removed before the new one is added, so that the helpers are evaluated once per document.
+        """
+        registration = self._js_helpers_registrations.get(_driver)
+        if registration is not None:
+            (registered_version, identifier) = registration
+            if registered_version == version:
+                return
+            _driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': identifier})
+            del self._js_helpers_registrations[_driver]
+        identifier = _driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': installer})['identifier']
+        self._js_helpers_registrations[_driver] = (version, identifier)
+
+    def _set_script_timeout(self, _driver, timeout):
+        """Bound async scripts on the driver side, so a stuck page releases the calling thread."""
+        if self._script_timeouts.get(_driver) != timeout:
+            _driver.set_script_timeout(timeout)
+            self._script_timeouts[_driver] = timeout
 
     def execute_js_with_injection(
             self, js_code_to_execute, injection_file='js_injection_funcs.js',
             _driver=None, timeout=5
     ):
-        """Execute JavaScript synchronously with a timeout."""
+        """Execute JavaScript synchronously with a timeout.
+        The injected helpers are (re)installed first if the page does not have them yet."""
         full_script = self._prepare_js_script(js_code_to_execute, injection_file)
 
         _driver = _driver or self.get_driver()
-
-        # Event for signaling that the script has completed or timed out
-        done = threading.Event()
-
-        # Wrapper function to execute the script
-        def run_script(thread_result):
-            try:
-                thread_result.data = _driver.execute_async_script(full_script)
-                if thread_result.data and "error" in thread_result.data:
-                    raise LoggerUtils(__name__).create_exception(
-                        'js_error', RuntimeError, log=True, detail=thread_result.data)
-            except Exception as e:
-                thread_result.exc_type = str(type(e))
-                thread_result.exc_traceback = traceback.format_exc()
-                thread_result.exc_message = str(e)
-                thread_result.exc_detail = str(getattr(e, 'error_context', ''))
-            finally:
-                done.set()
-
-        # Start the script in a separate thread
-        thread_result = ThreadResult()
-        script_thread = threading.Thread(target=run_script, args=(thread_result,))
-        script_thread.start()
-
-        # Wait for the script to complete or timeout
-        script_thread.join(timeout)
-        # Check for exception in thread
-        original_exception = None
-        if thread_result.exc_type:
-            original_exception = LoggerUtils(__name__).create_exception(
-                'execute_js_script_timeout', RuntimeError, log=False, detail=thread_result.exc_detail
-            )
-
-        if not done.is_set():
+        try:
+            self._set_script_timeout(_driver, timeout)
+            data = _driver.execute_async_script(full_script)
+            if data and data.get('helpersMissing'):
+                self._install_js_helpers(_driver, injection_file)
+                data = _driver.execute_async_script(full_script)
+        except TimeoutException as e:
             raise LoggerUtils(__name__).create_exception(
                 'execute_js_script_timeout', TimeoutError, log=True,
-                timeout=timeout, original_exception=original_exception)
-        elif original_exception:
-            raise original_exception
+                timeout=timeout, original_exception=e)
+        except WebDriverException as e:
+            raise LoggerUtils(__name__).create_exception(
+                'execute_js_script_error', RuntimeError, log=True, original_exception=e)
+        if data and "error" in data:
+            raise LoggerUtils(__name__).create_exception(
+                'js_error', RuntimeError, log=True, detail=data)
+        return data
 
-        # If completed, return the result
-        if script_thread.is_alive():
-            LoggerUtils(__name__).log('thread_joined_before_js_execution_finished', level=LoggerUtils.levels.WARNING)
-        return thread_result.data
+    async def execute_js_with_injection_async(
+            self, js_code_to_execute, injection_file='js_injection_funcs.js',
+            _driver=None, timeout=5
+    ):
+        """Execute JavaScript on the driver command executor without blocking the event loop."""
+        return await self.command_executor.run(
+            self.execute_js_with_injection, js_code_to_execute, injection_file, _driver, timeout,
+            timeout=timeout + DRIVER_COMMAND_TIMEOUT_GRACE_SECONDS)
 
 
 class BreadcrumbsBrowserManager(BrowserManager):
 
     def __init__(self, *args, browser_download_dir: Union[str, pathlib.Path],
-                 test_fetch_from_external_api_url: str, **kwargs):
+                 test_fetch_from_external_api_url: str, tab_pool_size: int = 1,
+                 resource_cache_max_entries: int = 1000, resource_store: Optional[ResourceStore] = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.browser_download_dir = browser_download_dir
         self.test_fetch_from_external_api_url = test_fetch_from_external_api_url
+        self.download_waiter = FileArrivalWaiter()
+        self.tab_pool = BrowserTabPool(self, size=tab_pool_size)
+        self.http_client = PierceHttpClient(self)
+        self.resource_cache = ResourceCache(max_entries=resource_cache_max_entries)
+        # Persists fetched resources across restarts; None keeps them in memory only
+        self.resource_store = resource_store
+        self._revalidations: Dict[str, asyncio.Task] = {}
+        # Fetches in flight by url, shared by every concurrent caller asking for the same url
+        self._in_flight_fetches: Dict[str, asyncio.Future] = {}
+        # Batched fetches, which resolve the in-flight fetches of their urls
+        self._batch_fetches: Set[asyncio.Task] = set()
+        self.started_fetches = 0
+        self.coalesced_fetches = 0
+        # Fetches the app is waiting for, which background crawling gives way to
+        self.live_fetches = 0
+        self.content_index = ContentIndex()
+        self.negative_cache = NegativeCache()
         if not all((browser_download_dir, test_fetch_from_external_api_url)):
             LoggerUtils(__name__).create_exception(
                 'missing_required_browser_setup_arguments', ValueError, log=True,
@@ -314,12 +544,15 @@ class BreadcrumbsBrowserManager(BrowserManager):
                 LoggerUtils(__name__).log(err_event, level=LoggerUtils.levels.INFO)
         return test_passed
 
-    def _generate_js_code(self, js_method_name, js_args):
+    def _generate_js_code(self, js_method_name, js_args, transport=FETCH_TRANSPORT_DOWNLOAD):
         """
         Generates JavaScript code for given method and arguments.
+        The filename of the expected download is returned for the download transport, None otherwise.
         """
-        unique_filename = str(uuid.uuid4()) + '.json'
-        js_args['download_to_filename'] = unique_filename  # Ensure filename is included
+        unique_filename = None
+        if transport == FETCH_TRANSPORT_DOWNLOAD:
+            unique_filename = str(uuid.uuid4()) + '.json'
+            js_args['download_to_filename'] = unique_filename  # Ensure filename is included
 
         # Handle callback argument
         for predefined_arg in ('callback',):
@@ -331,25 +564,57 @@ class BreadcrumbsBrowserManager(BrowserManager):
             f"var callback = arguments[arguments.length - 1];\n"
             f"var args = {js_args_json};\n"  # Pass the JSON as an object to JS
             f"args['callback'] = callback;\n"
-            f"{js_method_name}(args);\n"  # Call the JS function with the args object
+            f"window.__breadcrumbs.{js_method_name}(args);\n"  # Call the JS function with the args object
         )
         return js_code, unique_filename
 
+    def _get_fetch_js_args(self, config: dict, **js_args) -> dict:
+        transport = config['fetch_transport']
+        js_args.update({'modifyDocument': config['modify_browser_page_on_fetch'], 'transport': transport})
+        if transport == FETCH_TRANSPORT_CALLBACK:
+            js_args['chunkSize'] = config['callback_transport_chunk_size']
+        return js_args
+
+    def _read_callback_payload(self, result: dict, _driver):
+        """Extract the payload returned through the `execute_async_script` callback,
+        reading it back chunk by chunk if the page had to park it."""
+        if 'chunked' not in result:
+            return result.get('data')
+        payload_id = result['chunked']['payloadId']
+        length = result['chunked']['length']
+        chunk_size = result['chunked']['chunkSize']
+        chunks = []
+        try:
+            for start in range(0, length, chunk_size):
+                chunks.append(_driver.execute_script(READ_PAYLOAD_CHUNK_JS, payload_id, start, start + chunk_size))
+        finally:
+            _driver.execute_script(RELEASE_PAYLOAD_JS, payload_id)
+        LoggerUtils(__name__).log('callback_payload_read_in_chunks', level=LoggerUtils.levels.DEBUG,
+                                  length=length, chunks=len(chunks))
+        return json.loads(''.join(chunks))
+
+    async def _read_callback_payload_async(self, result: dict, _driver):
+        return await self.command_executor.run(self._read_callback_payload, result, _driver)
 
     def fetch_from_external_api_sync(self, url: str, url_source: str, _driver=None):
         """Synchronous version to fetch data from an external API.
         url_source is used for logging purposes.
         """
         config = get_settings_sync()
-        modify_document = config['modify_browser_page_on_fetch']
-        (js_code, unique_filename) = self._generate_js_code('fetchApiUrl', {'apiUrl': url, 'modifyDocument': modify_document})
+        transport = config['fetch_transport']
+        js_args = self._get_fetch_js_args(config, apiUrl=url)
+        (js_code, unique_filename) = self._generate_js_code('fetchApiUrl', js_args, transport)
         try:
-            self.execute_js_with_injection(js_code, _driver=_driver)
+            _driver = _driver or self.get_driver()
+            result = self.execute_js_with_injection(js_code, _driver=_driver)
+            if transport == FETCH_TRANSPORT_CALLBACK:
+                return self._read_callback_payload(result, _driver)
             self._wait_for_file_sync(os.path.join(self.browser_download_dir, unique_filename))
             with open(os.path.join(self.browser_download_dir, unique_filename), 'r', encoding='utf-8') as fh:
                 content = fh.read()
-        except RuntimeError as e:
-            err_context = dict(url=url, url_source=url_source)
+        except (RuntimeError, WebDriverException) as e:
+            self.invalidate_health(_driver)
+            err_context = dict(url=url, url_source=url_source, transport=transport)
             raise LoggerUtils(__name__).create_exception(
                 err_code='error_fetching_breadcrumbs',
                 err_type=RuntimeError,
@@ -359,26 +624,358 @@ class BreadcrumbsBrowserManager(BrowserManager):
             )
         return self._parse_and_remove_file(unique_filename, content)
 
+    @staticmethod
+    def _get_resource_cache_ttl(url: str, config: dict) -> Tuple[Optional[str], float]:
+        """Returns the resource type of a url and how long its data may be cached; 0 for urls not to cache."""
+        try:
+            (resource_type, _, _, _) = identify_resource(url)
+        except ValueError:
+            return None, 0
+        return resource_type, config['resource_cache_ttl_seconds'].get(resource_type, 0)
+
+    async def _cache_resource(self, url: str, data, resource_type: str, ttl_seconds: float):
+        # Error payloads are left to be fetched again
+        if ttl_seconds <= 0 or is_error_payload(data):
+            return
+        self.resource_cache.set(url, data, resource_type, ttl_seconds)
+        if self.resource_store:
+            try:
+                await asyncio.to_thread(self.resource_store.put, url, data, resource_type)
+            except sqlite3.Error as e:
+                LoggerUtils(__name__).log('resource_store_write_failed', level=LoggerUtils.levels.ERROR, e=e, url=url)
+
+    async def _get_stored_resource(self, url: str, url_source: str, resource_type: str, config: dict,
+                                   ttl_seconds: float):
+        """
+        Returns the resource from the persistent store, or None if it is not there or is too old to use.
+        A resource older than its type's TTL is still returned, but fetched again in the background.
+        """
+        try:
+            stored = await asyncio.to_thread(self.resource_store.get, url)
+        except sqlite3.Error as e:
+            LoggerUtils(__name__).log('resource_store_read_failed', level=LoggerUtils.levels.ERROR, e=e, url=url)
+            return None
+        if stored is None:
+            return None
+        (data, fetched_at) = stored
+        age_seconds = time.time() - fetched_at
+        if age_seconds >= config['resource_store_max_age_seconds']:
+            return None
+        if age_seconds < ttl_seconds:
+            self.resource_cache.set(url, data, resource_type, ttl_seconds - age_seconds)
+        elif url not in self._revalidations:
+            self._revalidations[url] = asyncio.create_task(
+                self._revalidate_resource(url, url_source, resource_type, ttl_seconds))
+        return data
+
+    async def _revalidate_resource(self, url: str, url_source: str, resource_type: str, ttl_seconds: float):
+        try:
+            await self._fetch_coalesced(url, url_source, resource_type, ttl_seconds)
+        except Exception as e:
+            LoggerUtils(__name__).log('resource_revalidation_failed', level=LoggerUtils.levels.WARNING,
+                                      e=e, url=url, url_source=url_source)
+        else:
+            LoggerUtils(__name__).log('resource_revalidated', level=LoggerUtils.levels.DEBUG, url=url)
+        finally:
+            self._revalidations.pop(url, None)
+
+    async def invalidate_resources(self, url: Optional[str] = None, resource_type: Optional[str] = None) -> Dict[str, int]:
+        """Drops cached resources and failures from every layer, returning the number dropped from each layer."""
+        invalidated = {
+            'memory': self.resource_cache.invalidate(url=url, resource_type=resource_type),
+            'store': 0,
+            'failures': self.negative_cache.invalidate(url=url, resource_type=resource_type),
+            'content_index': 0,
+        }
+        if self.resource_store:
+            invalidated['store'] = await asyncio.to_thread(self.resource_store.invalidate, url, resource_type)
+        if url is None:
+            invalidated['content_index'] = self.content_index.invalidate(resource_type=resource_type)
+        else:
+            classification = classify_url(url)
+            if classification.resource and resource_type in (None, classification.resource):
+                invalidated['content_index'] = self.content_index.invalidate(
+                    classification.resource, classification.resource_id)
+        return invalidated
+
+    def resource_cache_stats(self) -> dict:
+        return {
+            'memory': self.resource_cache.stats(),
+            'store': self.resource_store.stats() if self.resource_store else None,
+            'content_index': self.content_index.stats(),
+            'failures': self.negative_cache.stats(),
+        }
+
     async def fetch_from_external_api_async(self, url: str, url_source: str, _driver=None):
         """Asynchronous version to fetch breadcrumbs.
+        Resources are served from the resource cache while their type's TTL has not expired.
         url_source is used for logging purposes.
         """
         config = await get_settings()
-        modify_document = config['modify_browser_page_on_fetch']
-        (js_code, unique_filename) = self._generate_js_code('fetchApiUrl', {'apiUrl': url, 'modifyDocument': modify_document})
+        if _driver is not None:
+            js_args = self._get_fetch_js_args(config, apiUrl=url)
+            err_context = dict(url=url, url_source=url_source)
+            return await self._execute_fetch_js_async('fetchApiUrl', js_args, err_context, _driver=_driver)
+        (resource_type, ttl_seconds) = self._get_resource_cache_ttl(url, config)
+        data = await self._get_known_resource(url, url_source, resource_type, ttl_seconds, config)
+        if data is not None:
+            return data
+        self.live_fetches += 1
+        try:
+            return await self._fetch_coalesced(url, url_source, resource_type, ttl_seconds)
+        finally:
+            self.live_fetches -= 1
+
+    async def _get_known_resource(self, url: str, url_source: str, resource_type: Optional[str], ttl_seconds: float,
+                                  config: dict):
+        """
+        Returns the resource from the resource cache or the store, or the error payload Pierce recently answered
+        with for it; None if it has to be fetched. The remembered error of a url which failed recently is raised.
+        """
+        if ttl_seconds > 0:
+            data = self.resource_cache.get(url)
+            if data is None and self.resource_store:
+                data = await self._get_stored_resource(url, url_source, resource_type, config, ttl_seconds)
+            if data is not None:
+                return data
+        failure = self.negative_cache.get(url)
+        if failure is not None:
+            if failure.payload is not None:
+                return failure.payload
+            # Logged by the caller, along with the context of the failure
+            raise LoggerUtils(__name__).create_exception(
+                'resource_fetch_failed_recently', RuntimeError, log=False, **{
+                    **failure.error_context, 'url': url, 'url_source': url_source,
+                    'failures': failure.failures, 'retry_after_seconds': failure.retry_after_seconds()})
+        return None
+
+    async def fetch_many_from_external_api_async(self, urls: List[str], url_source: str,
+                                                 concurrency: Optional[int] = None) -> Dict[str, dict]:
+        """Fetch several URLs, mapping each one to either {'data': ...} or {'error': <exception>}.
+        Resources known from the caches or the negative cache are served from there, and urls already being
+        fetched are awaited. The others are fetched over direct HTTP if enabled, and whatever remains concurrently
+        within the page of one tab in a single script execution, at most `concurrency` at a time.
+        Fetched resources are cached just like fetch_from_external_api_async does.
+        url_source is used for logging purposes.
+        """
+        config = await get_settings()
+        outcomes = {}
+        cache_ttls = {}
+        for url in dict.fromkeys(urls):
+            cache_ttls[url] = self._get_resource_cache_ttl(url, config)
+            try:
+                data = await self._get_known_resource(url, url_source, *cache_ttls[url], config)
+            except RuntimeError as e:
+                outcomes[url] = {'error': e}
+                continue
+            if data is not None:
+                outcomes[url] = {'data': data}
+        # Nothing is awaited from here until the batch is started, which resolves the fetches registered for it
+        fetches = {}
+        batch = {}
+        for url in cache_ttls:
+            if url in outcomes:
+                continue
+            (resource_type, ttl_seconds) = cache_ttls[url]
+            fetch = self._in_flight_fetches.get(url)
+            if fetch is None:
+                fetch = asyncio.get_running_loop().create_future()
+                self._in_flight_fetches[url] = fetch
+                fetch.add_done_callback(functools.partial(self._forget_in_flight_fetch, url))
+                self.started_fetches += 1
+                batch[url] = (fetch, resource_type, ttl_seconds)
+            else:
+                self.coalesced_fetches += 1
+            fetches[url] = fetch
+        if batch:
+            batch_fetch = asyncio.create_task(self._fetch_batch_and_cache(batch, url_source, concurrency, config))
+            self._batch_fetches.add(batch_fetch)
+            batch_fetch.add_done_callback(self._batch_fetches.discard)
+        self.live_fetches += 1
+        try:
+            # A cancelled caller does not cancel the fetches for the others
+            results = await asyncio.gather(*(asyncio.shield(fetch) for fetch in fetches.values()),
+                                           return_exceptions=True)
+        finally:
+            self.live_fetches -= 1
+        for (url, result) in zip(fetches, results):
+            outcomes[url] = {'error': result} if isinstance(result, BaseException) else {'data': result}
+        return {url: outcomes[url] for url in dict.fromkeys(urls)}
+
+    async def _fetch_batch_and_cache(self, batch: Dict[str, Tuple[asyncio.Future, Optional[str], float]],
+                                     url_source: str, concurrency: Optional[int], config: dict):
+        """Fetches the urls of a batch, resolving each url's in-flight fetch with its data or error."""
+        try:
+            urls = list(batch)
+            if config['direct_http_fetch']:
+                semaphore = asyncio.Semaphore(concurrency or len(urls))
+
+                async def fetch_directly(url):
+                    async with semaphore:
+                        return await self.http_client.fetch(url)
+
+                results = await asyncio.gather(*(fetch_directly(url) for url in urls), return_exceptions=True)
+                for (url, result) in zip(urls, results):
+                    if isinstance(result, Exception):
+                        LoggerUtils(__name__).log('direct_http_fetch_failed_falling_back_to_browser',
+                                                  level=LoggerUtils.levels.WARNING, e=result, url=url,
+                                                  url_source=url_source)
+                    else:
+                        (fetch, resource_type, ttl_seconds) = batch[url]
+                        fetch.set_result(
+                            await self._cache_fetched(url, url_source, result, resource_type, ttl_seconds, config))
+                urls = [url for url in urls if not batch[url][0].done()]
+            if not urls:
+                return
+            js_args = self._get_fetch_js_args(config, apiUrls=urls)
+            if concurrency:
+                js_args['concurrency'] = concurrency
+            err_context = dict(urls=urls, url_source=url_source)
+            async with self._fetch_driver() as _driver:
+                results = await self._execute_fetch_js_async('fetchApiUrls', js_args, err_context, _driver=_driver)
+            for result in results:
+                url = result['apiUrl']
+                (fetch, resource_type, ttl_seconds) = batch[url]
+                if 'error' in result:
+                    # The in-page fetch of this very url failed, which is remembered like a failed single fetch
+                    error = LoggerUtils(__name__).create_exception(
+                        'error_fetching_breadcrumbs', RuntimeError, log=True,
+                        url=url, url_source=url_source, error=result['error'])
+                    self._record_fetch_failure(url, resource_type, config, error_context={
+                        **error.error_context, 'error': exception_to_str(error)})
+                    fetch.set_exception(error)
+                else:
+                    fetch.set_result(
+                        await self._cache_fetched(url, url_source, result['data'], resource_type, ttl_seconds, config))
+        except asyncio.CancelledError:
+            for (fetch, _, _) in batch.values():
+                fetch.cancel()
+            raise
+        except Exception as e:
+            # Failures of the browser, the driver or the transport are not remembered for the urls
+            for (fetch, _, _) in batch.values():
+                if not fetch.done():
+                    fetch.set_exception(e)
+
+    async def _fetch_coalesced(self, url: str, url_source: str, resource_type: Optional[str], ttl_seconds: float):
+        """Fetches and caches the url, unless a fetch of it is already in flight, whose result or exception is shared."""
+        fetch = self._in_flight_fetches.get(url)
+        if fetch is None:
+            fetch = asyncio.create_task(self._fetch_and_cache(url, url_source, resource_type, ttl_seconds))
+            self._in_flight_fetches[url] = fetch
+            fetch.add_done_callback(functools.partial(self._forget_in_flight_fetch, url))
+            self.started_fetches += 1
+        else:
+            self.coalesced_fetches += 1
+            LoggerUtils(__name__).log('fetch_coalesced', level=LoggerUtils.levels.DEBUG, url=url, url_source=url_source)
+        # A cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(fetch)
+
+    def _forget_in_flight_fetch(self, url: str, fetch: asyncio.Future):
+        if self._in_flight_fetches.get(url) is fetch:
+            del self._in_flight_fetches[url]
+        if not fetch.cancelled():
+            # Marks the exception as retrieved in case every caller has been cancelled
+            fetch.exception()
+
+    async def _fetch_and_cache(self, url: str, url_source: str, resource_type: Optional[str], ttl_seconds: float):
+        config = await get_settings()
         try:
-            self.execute_js_with_injection(js_code, _driver=_driver)
+            data = await self._fetch_uncached_async(url, url_source, config)
+        except Exception as e:
+            # A timeout or an outage of the browser would otherwise keep failing the url long after recovery
+            if is_page_fetch_error(e):
+                self._record_fetch_failure(url, resource_type, config, error_context={
+                    **getattr(e, 'error_context', {}), 'error': exception_to_str(e)})
+            raise
+        return await self._cache_fetched(url, url_source, data, resource_type, ttl_seconds, config)
+
+    async def _cache_fetched(self, url: str, url_source: str, data, resource_type: Optional[str], ttl_seconds: float,
+                             config: dict):
+        """Records the outcome of a fetch in the caches, the negative cache and the content index."""
+        if is_error_payload(data):
+            self._record_fetch_failure(url, resource_type, config, payload=data)
+        else:
+            self.negative_cache.record_success(url)
+        await self._cache_resource(url, data, resource_type, ttl_seconds)
+        if url_source != 'content_index':
+            # The crawler indexes what it fetches itself, without counting it as referenced by the app
+            self._index_content(url, data)
+        return data
+
+    def _record_fetch_failure(self, url: str, resource_type: Optional[str], config: dict, **failure_kwargs):
+        if config['negative_cache_base_seconds'] <= 0:
+            return
+        failure = self.negative_cache.record_failure(
+            url, resource_type, config['negative_cache_base_seconds'], config['negative_cache_max_seconds'],
+            **failure_kwargs)
+        LoggerUtils(__name__).log('resource_fetch_failure_cached', level=LoggerUtils.levels.WARNING, url=url,
+                                  failures=failure.failures, retry_after_seconds=failure.retry_after_seconds())
+
+    def _index_content(self, url: str, data):
+        """Seeds the content index with a fetched resource or the resources of a breadcrumbs payload."""
+        if isinstance(data, list):
+            self.content_index.add_breadcrumbs(data)
+        elif isinstance(data, dict) and not is_error_payload(data):
+            classification = classify_url(url)
+            if classification.resource:
+                self.content_index.add_payload(classification.resource, classification.resource_id, data)
+
+    async def fetch_resource_for_index(self, resource_type: str, resource_id: str):
+        """Fetches a resource bypassing the caches, which are refreshed with the result."""
+        url = build_resource_url(get_resource_plural_name(resource_type), resource_id)
+        (_, ttl_seconds) = self._get_resource_cache_ttl(url, await get_settings())
+        return await self._fetch_coalesced(url, 'content_index', resource_type, ttl_seconds)
+
+    def fetch_stats(self) -> dict:
+        return {
+            'started': self.started_fetches,
+            'coalesced': self.coalesced_fetches,
+            'in_flight': len(self._in_flight_fetches),
+            'live': self.live_fetches,
+        }
+
+    async def _fetch_uncached_async(self, url: str, url_source: str, config: dict):
+        if config['direct_http_fetch']:
+            try:
+                return await self.http_client.fetch(url)
+            except (httpx.HTTPError, RuntimeError) as e:
+                LoggerUtils(__name__).log('direct_http_fetch_failed_falling_back_to_browser',
+                                          level=LoggerUtils.levels.WARNING, e=e, url=url, url_source=url_source)
+        async with self._fetch_driver() as _driver:
+            return await self.fetch_from_external_api_async(url, url_source, _driver=_driver)
+
+    @asynccontextmanager
+    async def _fetch_driver(self):
+        """Yields the driver to run an in-page fetch with: the one of a pooled tab, which is checked out meanwhile."""
+        async with self.tab_pool.tab() as tab:
+            yield tab.driver
+
+    async def _execute_fetch_js_async(self, js_method_name: str, js_args: dict, err_context: dict, _driver=None):
+        """Run one of the in-page fetch functions and return its payload using the configured transport."""
+        transport = js_args['transport']
+        (js_code, unique_filename) = self._generate_js_code(js_method_name, js_args, transport)
+        try:
+            _driver = _driver or await self.command_executor.run(self.get_driver)
+            result = await self.execute_js_with_injection_async(js_code, _driver=_driver)
+            # The page answered a real fetch, which is as good as a health check
+            self.record_health_signal(_driver)
+            if transport == FETCH_TRANSPORT_CALLBACK:
+                return await self._read_callback_payload_async(result, _driver)
             await self._wait_for_file_async(os.path.join(self.browser_download_dir, unique_filename))
             async with aiofiles.open(os.path.join(self.browser_download_dir, unique_filename), 'r',
                                      encoding='utf-8') as fh:
                 content = await fh.read()
-        except RuntimeError as e:
-            err_context = dict(url=url, url_source=url_source)
+        except (RuntimeError, TimeoutError, WebDriverException) as e:
+            self.invalidate_health(_driver)
+            if isinstance(e, TimeoutError):
+                raise
             raise LoggerUtils(__name__).create_exception(
                 err_code='error_fetching_breadcrumbs',
                 err_type=RuntimeError,
                 log=True,
                 original_exception=e,
+                transport=transport,
                 **err_context
             )
         return self._parse_and_remove_file(unique_filename, content)
@@ -387,22 +984,28 @@ class BreadcrumbsBrowserManager(BrowserManager):
         """Generic method to execute a JavaScript method with any number of arguments."""
         js_code, unique_filename = self._generate_js_code(js_method_name, js_args)
 
-        self.execute_js_with_injection(js_code, _driver=_driver)
-        # TODO: add time limit
+        await self.execute_js_with_injection_async(js_code, _driver=_driver)
         await self._wait_for_file_async(os.path.join(self.browser_download_dir, unique_filename))
         async with aiofiles.open(os.path.join(self.browser_download_dir, unique_filename), 'r', encoding='utf-8') as fh:
             content = await fh.read()
         return self._parse_and_remove_file(unique_filename, content)
 
     async def _wait_for_file_async(self, file_path):
-        """Wait for the file to be created (asynchronous)."""
-        while not os.path.exists(file_path):
-            await asyncio.sleep(0.1)
+        """Wait for the downloaded file to be complete (asynchronous)."""
+        config = await get_settings()
+        return await self.download_waiter.wait_async(file_path, timeout=config['download_wait_timeout_seconds'])
 
     def _wait_for_file_sync(self, file_path):
-        """Wait for the file to be created (synchronous)."""
-        while not os.path.exists(file_path):
-            time.sleep(0.1)
+        """Wait for the downloaded file to be complete (synchronous)."""
+        config = get_settings_sync()
+        return self.download_waiter.wait_sync(file_path, timeout=config['download_wait_timeout_seconds'])
+
+    async def aclose(self):
+        """Releases the resources held for fetching; the browser itself is left running."""
+        for task in list(self._revalidations.values()) + list(self._in_flight_fetches.values()) + \
+                list(self._batch_fetches):
+            task.cancel()
+        await self.http_client.aclose()
 
     def _parse_and_remove_file(self, filename, content):
         """Parse JSON content and remove the file."""
@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import List, Optional
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from utils.log import LoggerUtils
+
+
+class TabHealth(Enum):
+    INITIALIZING = 'initializing'
+    HEALTHY = 'healthy'
+    # A command failed on the tab; it is probed before its next use.
+    SUSPECT = 'suspect'
+    UNHEALTHY = 'unhealthy'
+
+
+class PooledTab:
+    def __init__(self, index: int):
+        self.index = index
+        self.driver: Optional[WebDriver] = None
+        self.health = TabHealth.INITIALIZING
+        self.checkouts = 0
+        self.failures = 0
+
+    @property
+    def is_primary(self) -> bool:
+        return self.index == 0
+
+    def stats(self) -> dict:
+        return {
+            'index': self.index,
+            'health': self.health.value,
+            'checkouts': self.checkouts,
+            'failures': self.failures,
+        }
+
+
+class BrowserTabPool:
+    """
+    A pool of authenticated tabs in the debugger-attached browser.
+    Tab 0 is driven by the browser manager's own driver, every other tab
+    by an extra WebDriver session attached to the same browser, so all tabs
+    share the browser's cookie profile and can run fetches in parallel.
+    """
+
+    def __init__(self, browser_manager, size: int):
+        if size < 1:
+            raise LoggerUtils(__name__).create_exception('invalid_browser_tab_pool_size', ValueError, log=True, size=size)
+        self.browser_manager = browser_manager
+        self.size = size
+        self._tabs: List[PooledTab] = [PooledTab(index) for index in range(size)]
+        self._idle_tabs = asyncio.Queue()
+        for tab in self._tabs:
+            self._idle_tabs.put_nowait(tab)
+
+    async def checkout(self) -> PooledTab:
+        """Wait for an idle tab and make sure it is usable before handing it out."""
+        tab = await self._idle_tabs.get()
+        try:
+            await self.browser_manager.command_executor.run(self._prepare_tab, tab)
+        except BaseException:
+            tab.health = TabHealth.UNHEALTHY
+            self._idle_tabs.put_nowait(tab)
+            raise
+        tab.checkouts += 1
+        return tab
+
+    def checkin(self, tab: PooledTab, failed: bool = False):
+        if failed:
+            tab.failures += 1
+            tab.health = TabHealth.SUSPECT
+        self._idle_tabs.put_nowait(tab)
+
+    @asynccontextmanager
+    async def tab(self):
+        tab = await self.checkout()
+        failed = False
+        try:
+            yield tab
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.checkin(tab, failed=failed)
+
+    async def warm_up(self):
+        """Opens and checks every tab up front instead of on first use."""
+        tabs = [await self.checkout() for _ in range(self.size)]
+        for tab in tabs:
+            self.checkin(tab)
+
+    def _prepare_tab(self, tab: PooledTab):
+        if tab.is_primary:
+            # The manager's own driver is health-checked by get_driver().
+            tab.driver = self.browser_manager.get_driver()
+        elif tab.health == TabHealth.HEALTHY:
+            return
+        elif tab.driver and tab.health == TabHealth.SUSPECT and \
+                self.browser_manager._is_page_responsive(_driver=tab.driver):
+            LoggerUtils(__name__).log('browser_tab_recovered', level=LoggerUtils.levels.INFO, tab=tab.index)
+        else:
+            if tab.driver:
+                self.browser_manager.close_tab_driver(tab.driver)
+                tab.driver = None
+            LoggerUtils(__name__).log('opening_browser_tab', level=LoggerUtils.levels.INFO,
+                                      tab=tab.index, previous_health=tab.health.value)
+            tab.driver = self.browser_manager.create_tab_driver()
+        tab.health = TabHealth.HEALTHY
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'idle': self._idle_tabs.qsize(),
+            'tabs': [tab.stats() for tab in self._tabs],
+        }
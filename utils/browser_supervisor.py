@@ -0,0 +1,133 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import psutil
+
+from utils.log import LoggerUtils
+
+
+class BrowserSupervisor:
+    """
+    Owns the browser process it spawned: tracks its PID and process group,
+    gets notified when it exits, and stops only its own processes.
+    The debugging port is probed with a direct socket connect.
+    """
+
+    def __init__(self, debugging_port: int):
+        self.debugging_port = debugging_port
+        self.process: Optional[subprocess.Popen] = None
+        self._stopping = False
+        self._crashed = threading.Event()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def crashed(self) -> bool:
+        """Whether the spawned browser exited without being stopped by the supervisor."""
+        return self._crashed.is_set()
+
+    def mark_recovered(self):
+        """Clears the crash once a driver is attached to a working browser on the port again,
+        e.g. one that was already listening there and was not spawned anew."""
+        if self._crashed.is_set():
+            self._crashed.clear()
+            LoggerUtils(__name__).log('browser_recovered', level=LoggerUtils.levels.INFO,
+                                      port=self.debugging_port, pid=self.pid, running=self.is_running())
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def is_debugging_port_open(self, timeout: float = 0.5) -> bool:
+        try:
+            with socket.create_connection(('localhost', self.debugging_port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def is_debugging_port_held_by_other_process(self) -> bool:
+        """Whether the debugging port is held by a browser the supervisor did not spawn and cannot stop."""
+        return not self.is_running() and self.is_debugging_port_open()
+
+    def wait_for_debugging_port(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.is_debugging_port_open():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def start(self, cmd: List[str]):
+        """Spawns the browser in a process group of its own and watches for its exit."""
+        platform = sys.platform
+        if platform == 'win32':
+            process = subprocess.Popen(cmd, creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       stdin=subprocess.DEVNULL, start_new_session=True)
+        self.process = process
+        self._stopping = False
+        self._crashed.clear()
+        threading.Thread(target=self._watch, args=(process,), name=f'browser-supervisor-{process.pid}', daemon=True).start()
+        LoggerUtils(__name__).log('browser_process_started', level=LoggerUtils.levels.INFO,
+                                  pid=process.pid, port=self.debugging_port)
+
+    def _watch(self, process: subprocess.Popen):
+        returncode = process.wait()
+        if process is not self.process:
+            return
+        if self._stopping:
+            LoggerUtils(__name__).log('browser_process_stopped', level=LoggerUtils.levels.INFO,
+                                      pid=process.pid, returncode=returncode)
+        else:
+            self._crashed.set()
+            LoggerUtils(__name__).log('browser_process_exited_unexpectedly', level=LoggerUtils.levels.ERROR,
+                                      pid=process.pid, returncode=returncode, port=self.debugging_port)
+
+    def stop(self, timeout_secs: float = 10):
+        """Terminates the spawned browser with its whole process group, killing it if it does not exit in time."""
+        if not self.is_running():
+            if self.is_debugging_port_open():
+                LoggerUtils(__name__).log('browser_not_owned_by_supervisor', level=LoggerUtils.levels.WARNING,
+                                          port=self.debugging_port,
+                                          detail='The browser on the debugging port was not started by the app '
+                                                 'and is left running.')
+            return
+        self._stopping = True
+        process = self.process
+        LoggerUtils(__name__).log('stopping_browser_process', level=LoggerUtils.levels.INFO, pid=process.pid)
+        self._signal_process_group(process, signal.SIGTERM)
+        try:
+            process.wait(timeout=timeout_secs)
+        except subprocess.TimeoutExpired:
+            LoggerUtils(__name__).log('browser_process_did_not_terminate', level=LoggerUtils.levels.WARNING,
+                                      pid=process.pid, timeout=timeout_secs)
+            self._signal_process_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            try:
+                process.wait(timeout=timeout_secs)
+            except subprocess.TimeoutExpired:
+                raise LoggerUtils(__name__).create_exception(
+                    'failed_to_kill_browser_process', TimeoutError, log=True, timeout=timeout_secs, pid=process.pid)
+
+    @staticmethod
+    def _signal_process_group(process: subprocess.Popen, sig):
+        try:
+            if sys.platform == 'win32':
+                # No process groups to signal: terminate the spawned process tree instead
+                parent = psutil.Process(process.pid)
+                for member in parent.children(recursive=True) + [parent]:
+                    if sig == signal.SIGTERM:
+                        member.terminate()
+                    else:
+                        member.kill()
+            else:
+                os.killpg(os.getpgid(process.pid), sig)
+        except (ProcessLookupError, psutil.NoSuchProcess):
+            pass
@@ -0,0 +1,213 @@
+import asyncio
+import itertools
+import json
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import httpx
+import websockets
+
+from config.config import get_settings_sync
+from utils.browser_manager import BreadcrumbsBrowserManager, JS_HELPERS_INSTALLER_TEMPLATE, load_js_helpers
+from utils.log import LoggerUtils
+
+# Chrome's window handles are the CDP target ids of the tabs with this prefix
+WINDOW_HANDLE_PREFIX = 'CDwindow-'
+
+# Runs a script written for `execute_async_script` as a promise:
+# the script's callback, its last argument, resolves the promise.
+CDP_CALLBACK_EXPRESSION_TEMPLATE = (
+    "new Promise(function (resolve) {{\n"
+    "(function () {{\n"
+    "{script}\n"
+    "}})(resolve);\n"
+    "}})"
+)
+READ_PAYLOAD_CHUNK_EXPRESSION_TEMPLATE = 'window.__breadcrumbsPayloads[{payload_id}].slice({start}, {end})'
+RELEASE_PAYLOAD_EXPRESSION_TEMPLATE = 'delete window.__breadcrumbsPayloads[{payload_id}]'
+
+
+class CdpConnection:
+    """
+    A Chrome DevTools Protocol connection to a single target.
+    Any number of commands may be awaited concurrently: responses are matched to them by message id.
+    """
+
+    def __init__(self, websocket_url: str):
+        self.websocket_url = websocket_url
+        # The version and identifier of the helpers registered for new documents over this connection
+        self.registered_helpers: Optional[Tuple[str, str]] = None
+        self._websocket = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._message_ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if not self.is_open:
+                self._websocket = await websockets.connect(self.websocket_url, max_size=None)
+                # Scripts registered for new documents were dropped along with the earlier connection's session
+                self.registered_helpers = None
+                self._reader_task = asyncio.create_task(self._read_messages())
+
+    async def _read_messages(self):
+        try:
+            async for message in self._websocket:
+                payload = json.loads(message)
+                # Events carry no id and are not subscribed to
+                future = self._pending.pop(payload.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in payload:
+                    future.set_exception(LoggerUtils(__name__).create_exception(
+                        'cdp_command_error', RuntimeError, log=False, error=payload['error']))
+                else:
+                    future.set_result(payload.get('result', {}))
+        except websockets.ConnectionClosed as e:
+            LoggerUtils(__name__).log('cdp_connection_closed', level=LoggerUtils.levels.WARNING,
+                                      e=e, websocket_url=self.websocket_url)
+        finally:
+            (pending, self._pending) = (self._pending, {})
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(LoggerUtils(__name__).create_exception(
+                        'cdp_connection_closed', RuntimeError, log=False, websocket_url=self.websocket_url))
+
+    async def send(self, method: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        await self._ensure_connected()
+        message_id = next(self._message_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._websocket.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError as e:
+            raise LoggerUtils(__name__).create_exception(
+                'cdp_command_timeout', TimeoutError, log=True, original_exception=e, method=method, timeout=timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+class CdpBreadcrumbsBrowserManager(BreadcrumbsBrowserManager):
+    """
+    Evaluates the in-page fetches over the DevTools websocket of the debugger-attached browser,
+    using `Runtime.evaluate` with `awaitPromise`, instead of Selenium's `execute_async_script`.
+    The fetches do not check out pooled tabs: they are multiplexed over the connection of the manager's own tab,
+    at most max_concurrent_evaluations at a time.
+    Selenium still starts the browser, opens the pool's tabs and runs the synchronous health check;
+    a tab's CDP target is the one behind its driver's window handle.
+    """
+
+    def __init__(self, *args, max_concurrent_evaluations: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connections: Dict[str, CdpConnection] = {}
+        self._target_ids = weakref.WeakKeyDictionary()
+        self._evaluation_slots = asyncio.Semaphore(
+            max_concurrent_evaluations or get_settings_sync()['cdp_max_concurrent_evaluations'])
+
+    @asynccontextmanager
+    async def _fetch_driver(self):
+        async with self._evaluation_slots:
+            yield await self.command_executor.run(self.get_driver)
+
+    @property
+    def devtools_http_url(self) -> str:
+        return f'http://localhost:{self.debugging_browser_port}'
+
+    async def _discover_websocket_url(self, target_id: str) -> str:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f'{self.devtools_http_url}/json/list')
+        for target in response.json():
+            if target.get('id') == target_id:
+                return target['webSocketDebuggerUrl']
+        raise LoggerUtils(__name__).create_exception(
+            'cdp_target_not_found', RuntimeError, log=True, target_id=target_id)
+
+    async def _get_connection(self, _driver) -> CdpConnection:
+        target_id = self._target_ids.get(_driver)
+        if target_id is None:
+            window_handle = await self.command_executor.run(lambda: _driver.current_window_handle)
+            target_id = window_handle.removeprefix(WINDOW_HANDLE_PREFIX)
+            self._target_ids[_driver] = target_id
+        connection = self._connections.get(target_id)
+        if connection is None:
+            connection = CdpConnection(await self._discover_websocket_url(target_id))
+            self._connections[target_id] = connection
+        return connection
+
+    async def _evaluate(self, connection: CdpConnection, expression: str, timeout: float):
+        result = await connection.send('Runtime.evaluate', {
+            'expression': expression,
+            'awaitPromise': True,
+            'returnByValue': True,
+        }, timeout=timeout)
+        if 'exceptionDetails' in result:
+            raise LoggerUtils(__name__).create_exception(
+                'execute_js_script_error', RuntimeError, log=True, detail=result['exceptionDetails'].get('text'))
+        return result['result'].get('value')
+
+    async def _install_js_helpers_async(self, connection: CdpConnection, injection_file: str, timeout: float):
+        (source, version) = load_js_helpers(injection_file)
+        installer = JS_HELPERS_INSTALLER_TEMPLATE.format(source=source, version=json.dumps(version))
+        if connection.registered_helpers is None or connection.registered_helpers[0] != version:
+            if connection.registered_helpers is not None:
+                await connection.send('Page.removeScriptToEvaluateOnNewDocument',
+                                      {'identifier': connection.registered_helpers[1]}, timeout=timeout)
+                connection.registered_helpers = None
+            registration = await connection.send(
+                'Page.addScriptToEvaluateOnNewDocument', {'source': installer}, timeout=timeout)
+            connection.registered_helpers = (version, registration['identifier'])
+        await self._evaluate(connection, installer, timeout)
+        LoggerUtils(__name__).log('js_helpers_installed', level=LoggerUtils.levels.INFO, version=version, engine='cdp')
+
+    async def execute_js_with_injection_async(
+            self, js_code_to_execute, injection_file='js_injection_funcs.js',
+            _driver=None, timeout=5
+    ):
+        """Evaluate JavaScript written for `execute_async_script` over CDP."""
+        _driver = _driver or await self.command_executor.run(self.get_driver)
+        connection = await self._get_connection(_driver)
+        expression = CDP_CALLBACK_EXPRESSION_TEMPLATE.format(
+            script=self._prepare_js_script(js_code_to_execute, injection_file))
+        data = await self._evaluate(connection, expression, timeout)
+        if data and data.get('helpersMissing'):
+            await self._install_js_helpers_async(connection, injection_file, timeout)
+            data = await self._evaluate(connection, expression, timeout)
+        if data and "error" in data:
+            raise LoggerUtils(__name__).create_exception(
+                'js_error', RuntimeError, log=True, detail=data)
+        return data
+
+    async def _read_callback_payload_async(self, result: dict, _driver):
+        if 'chunked' not in result:
+            return result.get('data')
+        connection = await self._get_connection(_driver)
+        payload_id = json.dumps(result['chunked']['payloadId'])
+        length = result['chunked']['length']
+        chunk_size = result['chunked']['chunkSize']
+        try:
+            chunks = await asyncio.gather(*(
+                self._evaluate(connection, READ_PAYLOAD_CHUNK_EXPRESSION_TEMPLATE.format(
+                    payload_id=payload_id, start=start, end=start + chunk_size), timeout=None)
+                for start in range(0, length, chunk_size)))
+        finally:
+            await self._evaluate(connection, RELEASE_PAYLOAD_EXPRESSION_TEMPLATE.format(payload_id=payload_id),
+                                 timeout=None)
+        return json.loads(''.join(chunks))
+
+    async def aclose(self):
+        await super().aclose()
+        await asyncio.gather(*(connection.close() for connection in self._connections.values()))
+        self._connections.clear()
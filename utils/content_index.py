@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.log import LoggerUtils
+from utils.pierce_api import is_error_payload
+
+# From the root of the content hierarchy down
+HIERARCHY_RESOURCE_TYPES = ['faculty', 'profession', 'track', 'course', 'sprint', 'topic', 'lesson', 'task']
+# The structural levels; lessons and tasks change too often to be served from the index
+INDEXED_RESOURCE_TYPES = HIERARCHY_RESOURCE_TYPES[:HIERARCHY_RESOURCE_TYPES.index('lesson')]
+
+NodeKey = Tuple[str, str]
+
+# The number of resources fetched in one crawl round at most
+CRAWL_BATCH_SIZE = 50
+
+
+class ContentNode:
+    def __init__(self, resource_type: str, resource_id: str):
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        # The payload of the resource's build_resource_url endpoint; None until the node is crawled
+        self.payload: Optional[dict] = None
+        self.parent: Optional[NodeKey] = None
+        # When the resource was last crawled, successfully or not
+        self.indexed_at: Optional[float] = None
+        # When the app last fetched or looked up the resource or one of its descendants
+        self.referenced_at = time.monotonic()
+
+
+class ContentIndex:
+    """
+    An in-memory index of the structural levels of the Pierce content hierarchy, with a pointer from every
+    resource to its parent. It is seeded with the resources the app fetches anyway; the ancestors they point at
+    are crawled in the background and every indexed resource is re-fetched once it is older than the refresh
+    interval, so that most parent lookups of postprocess_fetched_data need no fetch at all.
+    Resources the app has not referenced for a while are evicted instead of being refreshed.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[NodeKey, ContentNode] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _get_or_create_node(self, resource_type: str, resource_id) -> ContentNode:
+        key = (resource_type, str(resource_id))
+        if key not in self._nodes:
+            self._nodes[key] = ContentNode(*key)
+        return self._nodes[key]
+
+    def _reference_node(self, resource_type: str, resource_id) -> ContentNode:
+        node = self._get_or_create_node(resource_type, resource_id)
+        node.referenced_at = time.monotonic()
+        return node
+
+    def add_payload(self, resource_type: str, resource_id, payload: dict, referenced: bool = True):
+        """Indexes the payload of a resource's detail endpoint, which carries the ids of the resource's ancestors.
+        Of lessons and tasks, only the ancestors are indexed, to be crawled."""
+        if resource_type not in HIERARCHY_RESOURCE_TYPES:
+            return
+        get_node = self._reference_node if referenced else self._get_or_create_node
+        parent = None
+        for ancestor_type in INDEXED_RESOURCE_TYPES[:HIERARCHY_RESOURCE_TYPES.index(resource_type)]:
+            ancestor_id = payload.get(f'{ancestor_type}_id')
+            if ancestor_id is not None:
+                ancestor = get_node(ancestor_type, ancestor_id)
+                # Ancestors are visited from the root down, so the last one found is the parent
+                parent = (ancestor.resource_type, ancestor.resource_id)
+        if resource_type in INDEXED_RESOURCE_TYPES:
+            node = get_node(resource_type, resource_id)
+            node.payload = payload
+            node.indexed_at = time.monotonic()
+            node.parent = parent
+
+    def add_breadcrumbs(self, levels: List[dict]):
+        """Makes the resources of a breadcrumbs payload known to the index, so that they get crawled."""
+        for level in levels:
+            if level.get('type') in INDEXED_RESOURCE_TYPES and level.get('id') is not None:
+                self._reference_node(level['type'], level['id'])
+
+    def invalidate(self, resource_type: Optional[str] = None, resource_id=None) -> int:
+        """Drops the indexed resources of a type, the one with the given id, or all of them."""
+        keys = [key for key in self._nodes
+                if (resource_type is None or key[0] == resource_type)
+                and (resource_id is None or key[1] == str(resource_id))]
+        for key in keys:
+            del self._nodes[key]
+        return len(keys)
+
+    def get(self, resource_type: str, resource_id, max_age_seconds: float) -> Optional[dict]:
+        """Returns the indexed payload of a resource, or None if it has not been crawled or is too old."""
+        if resource_type not in INDEXED_RESOURCE_TYPES:
+            return None
+        node = self._reference_node(resource_type, resource_id)
+        if node.payload is None or time.monotonic() - node.indexed_at >= max_age_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return node.payload
+
+    def evict_unreferenced(self, max_idle_seconds: float) -> int:
+        """Drops the resources the app has not referenced for max_idle_seconds."""
+        now = time.monotonic()
+        keys = [key for (key, node) in self._nodes.items() if now - node.referenced_at >= max_idle_seconds]
+        for key in keys:
+            del self._nodes[key]
+        self.evicted += len(keys)
+        return len(keys)
+
+    def nodes_to_crawl(self, refresh_interval_seconds: float, limit: int) -> List[ContentNode]:
+        """Resources never crawled come first, then the ones indexed longest ago, roots of the hierarchy first."""
+        now = time.monotonic()
+        due = [node for node in self._nodes.values()
+               if node.indexed_at is None or now - node.indexed_at >= refresh_interval_seconds]
+        due.sort(key=lambda node: (node.indexed_at is not None, node.indexed_at or 0,
+                                   HIERARCHY_RESOURCE_TYPES.index(node.resource_type)))
+        return due[:limit]
+
+    async def crawl(self, fetch_resource: Callable[[str, str], Awaitable[dict]], refresh_interval_seconds: float,
+                    concurrency: int, batch_size: int = CRAWL_BATCH_SIZE,
+                    should_yield: Optional[Callable[[], bool]] = None) -> int:
+        """Fetches a batch of resources due for crawling and indexes them. Returns the number of resources indexed.
+        Resources not fetched yet when should_yield returns True are left for the next round."""
+        nodes = self.nodes_to_crawl(refresh_interval_seconds, batch_size)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def crawl_node(node: ContentNode) -> bool:
+            try:
+                async with semaphore:
+                    if should_yield is not None and should_yield():
+                        return False
+                    payload = await fetch_resource(node.resource_type, node.resource_id)
+            except Exception as e:
+                payload = None
+                LoggerUtils(__name__).log('content_index_crawl_failed', level=LoggerUtils.levels.WARNING, e=e,
+                                          resource_type=node.resource_type, resource_id=node.resource_id)
+            if not isinstance(payload, dict) or is_error_payload(payload):
+                # Not retried before the refresh interval, so that it does not hold up the rest of the crawl
+                node.indexed_at = time.monotonic()
+                return False
+            if (node.resource_type, node.resource_id) in self._nodes:
+                self.add_payload(node.resource_type, node.resource_id, payload, referenced=False)
+            return True
+
+        return sum(await asyncio.gather(*(crawl_node(node) for node in nodes)))
+
+    def stats(self) -> dict:
+        indexed = [node for node in self._nodes.values() if node.payload is not None]
+        return {
+            'known': len(self._nodes),
+            'indexed': len(indexed),
+            'indexed_by_type': {
+                resource_type: sum(1 for node in indexed if node.resource_type == resource_type)
+                for resource_type in INDEXED_RESOURCE_TYPES},
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+        }
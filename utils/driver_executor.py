@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional
+
+from utils.log import LoggerUtils
+
+
+class DriverCommandExecutor:
+    """
+    A bounded thread pool for blocking WebDriver commands with an awaitable API.
+    Commands that time out or whose caller is cancelled are cancelled if still queued.
+    A command that is already running cannot be interrupted from Python, so commands
+    should also be bounded on the driver side (e.g. by the script timeout).
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webdriver-command')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._timed_out = 0
+        self._cancelled = 0
+
+    def _run_command(self, fn: Callable, args: tuple):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def _on_command_done(self, future: Future):
+        if future.cancelled():
+            # The command never started, so it is still counted as queued.
+            with self._lock:
+                self._queued -= 1
+                self._cancelled += 1
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """Run fn(*args) on a worker thread and await its result, raising TimeoutError after `timeout` seconds."""
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(self._run_command, fn, args)
+        future.add_done_callback(self._on_command_done)
+        try:
+            # Cancelling the awaited wrapper cancels the underlying future if it has not started yet.
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError as e:
+            with self._lock:
+                self._timed_out += 1
+            raise LoggerUtils(__name__).create_exception(
+                'driver_command_timeout', TimeoutError, log=True, original_exception=e,
+                command=getattr(fn, '__name__', str(fn)), timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'queued': self._queued,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'timed_out': self._timed_out,
+                'cancelled': self._cancelled,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,196 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from utils.log import LoggerUtils
+
+PARTIAL_DOWNLOAD_SUFFIX = '.crdownload'
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # Accessing the attributes checks that the libc provides inotify
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_inotify_libc = _load_inotify()
+
+
+class _InotifyWatch:
+    """A non-blocking inotify watch over a single directory."""
+
+    def __init__(self, directory: str):
+        self.fd = _inotify_libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = _inotify_libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+
+    def read_names(self) -> set:
+        """Names of the files completed (closed after writing or moved in) since the last read."""
+        names = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                _, _, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                name_start = offset + _EVENT_HEADER.size
+                names.add(os.fsdecode(buffer[name_start:name_start + name_length].rstrip(b'\0')))
+                offset = name_start + name_length
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FileArrivalWaiter:
+    """
+    Waits for a downloaded file to be complete, not merely present.
+    Uses inotify on Linux and falls back to polling elsewhere or if inotify cannot be set up.
+    A download counts as complete once the browser has moved it to its final name
+    (or closed it after writing) and no partial download file is left next to it.
+    """
+
+    def __init__(self, poll_interval: float = 0.1, use_inotify: bool = True):
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and _inotify_libc is not None
+
+    @staticmethod
+    def _is_complete(file_path) -> bool:
+        return os.path.exists(file_path) and not os.path.exists(file_path + PARTIAL_DOWNLOAD_SUFFIX)
+
+    def _open_watch(self, file_path):
+        if not self.use_inotify:
+            return None
+        try:
+            return _InotifyWatch(os.path.dirname(file_path) or '.')
+        except OSError as e:
+            LoggerUtils(__name__).log('inotify_unavailable_falling_back_to_polling',
+                                      level=LoggerUtils.levels.WARNING, e=e, file_path=file_path)
+            return None
+
+    def _timeout_exception(self, file_path, timeout, mechanism):
+        return LoggerUtils(__name__).create_exception(
+            'download_wait_timeout', TimeoutError, log=True,
+            file_path=file_path, timeout=timeout, mechanism=mechanism)
+
+    def _log_completion(self, file_path, started_at, mechanism) -> float:
+        waited_seconds = time.monotonic() - started_at
+        LoggerUtils(__name__).log('download_wait_completed', level=LoggerUtils.levels.DEBUG,
+                                  file_path=file_path, waited_seconds=round(waited_seconds, 4), mechanism=mechanism)
+        return waited_seconds
+
+    def wait_sync(self, file_path, timeout: float) -> float:
+        """Block until the file is complete. Returns the seconds waited, raises TimeoutError."""
+        started_at = time.monotonic()
+        deadline = started_at + timeout
+        watch = self._open_watch(file_path)
+        if watch is None:
+            self._poll_sync(file_path, deadline, timeout)
+            return self._log_completion(file_path, started_at, 'polling')
+
+        with watch:
+            file_name = os.path.basename(file_path)
+            while not self._is_complete(file_path):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timeout_exception(file_path, timeout, 'inotify')
+                ready, _, _ = select.select([watch.fd], [], [], remaining)
+                if ready and file_name in watch.read_names():
+                    break
+        return self._log_completion(file_path, started_at, 'inotify')
+
+    async def wait_async(self, file_path, timeout: float) -> float:
+        """Wait until the file is complete. Returns the seconds waited, raises TimeoutError."""
+        started_at = time.monotonic()
+        deadline = started_at + timeout
+        watch = self._open_watch(file_path)
+        if watch is None:
+            await self._poll_async(file_path, deadline, timeout)
+            return self._log_completion(file_path, started_at, 'polling')
+
+        loop = asyncio.get_running_loop()
+        file_name = os.path.basename(file_path)
+        events = asyncio.Event()
+        try:
+            loop.add_reader(watch.fd, events.set)
+        except NotImplementedError:
+            watch.close()
+            await self._poll_async(file_path, deadline, timeout)
+            return self._log_completion(file_path, started_at, 'polling')
+
+        try:
+            while not self._is_complete(file_path):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timeout_exception(file_path, timeout, 'inotify')
+                try:
+                    await asyncio.wait_for(events.wait(), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                events.clear()
+                if file_name in watch.read_names():
+                    break
+        finally:
+            loop.remove_reader(watch.fd)
+            watch.close()
+        return self._log_completion(file_path, started_at, 'inotify')
+
+    def _poll_is_complete(self, file_path, last_size):
+        """Polling cannot see the file being closed, so the size must also hold still between two polls."""
+        if not self._is_complete(file_path):
+            return False, None
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return False, None
+        return size == last_size, size
+
+    def _poll_sync(self, file_path, deadline, timeout):
+        last_size = None
+        while True:
+            complete, last_size = self._poll_is_complete(file_path, last_size)
+            if complete:
+                return
+            if time.monotonic() >= deadline:
+                raise self._timeout_exception(file_path, timeout, 'polling')
+            time.sleep(self.poll_interval)
+
+    async def _poll_async(self, file_path, deadline, timeout):
+        last_size = None
+        while True:
+            complete, last_size = self._poll_is_complete(file_path, last_size)
+            if complete:
+                return
+            if time.monotonic() >= deadline:
+                raise self._timeout_exception(file_path, timeout, 'polling')
+            await asyncio.sleep(self.poll_interval)
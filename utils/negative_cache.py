@@ -0,0 +1,75 @@
+import time
+from typing import Any, Dict, Optional
+
+
+class ResourceFailure:
+    def __init__(self, resource_type: Optional[str]):
+        self.resource_type = resource_type
+        self.failures = 0
+        self.retry_at = 0.0
+        # The error payload Pierce answered with, or the context of the exception the fetch failed with
+        self.payload: Optional[Any] = None
+        self.error_context: dict = {}
+
+    def retry_after_seconds(self) -> float:
+        return max(0.0, round(self.retry_at - time.monotonic(), 1))
+
+
+class NegativeCache:
+    """
+    Remembers resource urls whose fetch failed, so that lookups fail fast until their retry-after passes.
+    The retry-after doubles with every consecutive failure of a url, from base_seconds up to max_seconds,
+    and is reset by a successful fetch.
+    """
+
+    def __init__(self):
+        self._failures: Dict[str, ResourceFailure] = {}
+        self.fast_failures = 0
+
+    def get(self, url: str) -> Optional[ResourceFailure]:
+        """Returns the failure of the url if its retry-after has not passed yet."""
+        failure = self._failures.get(url)
+        if failure is None or time.monotonic() >= failure.retry_at:
+            return None
+        self.fast_failures += 1
+        return failure
+
+    def retry_after_seconds(self, url: str) -> Optional[float]:
+        failure = self._failures.get(url)
+        return failure.retry_after_seconds() if failure else None
+
+    def record_failure(self, url: str, resource_type: Optional[str], base_seconds: float, max_seconds: float,
+                       payload: Optional[Any] = None, error_context: Optional[dict] = None) -> ResourceFailure:
+        now = time.monotonic()
+        self._forget_expired(now, max_seconds)
+        failure = self._failures.setdefault(url, ResourceFailure(resource_type))
+        failure.failures += 1
+        failure.retry_at = now + min(base_seconds * 2 ** (failure.failures - 1), max_seconds)
+        failure.payload = payload
+        failure.error_context = error_context or {}
+        return failure
+
+    def record_success(self, url: str):
+        self._failures.pop(url, None)
+
+    def _forget_expired(self, now: float, max_seconds: float):
+        # A url retried long enough ago starts over from the base retry-after
+        expired = [url for (url, failure) in self._failures.items() if now - failure.retry_at >= max_seconds]
+        for url in expired:
+            del self._failures[url]
+
+    def invalidate(self, url: Optional[str] = None, resource_type: Optional[str] = None) -> int:
+        urls = [failing_url for (failing_url, failure) in self._failures.items()
+                if (url is None or failing_url == url)
+                and (resource_type is None or failure.resource_type == resource_type)]
+        for failing_url in urls:
+            del self._failures[failing_url]
+        return len(urls)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'failing': sum(1 for failure in self._failures.values() if now < failure.retry_at),
+            'tracked': len(self._failures),
+            'fast_failures': self.fast_failures,
+        }
@@ -1,7 +1,7 @@
+import functools
 import json
-import re
 from collections import defaultdict
-from typing import Union, Tuple, Any
+from typing import Union, Tuple, Any, List, NamedTuple, Optional
 
 from config.config import get_settings
 from models import IssueData
@@ -24,35 +24,73 @@ def get_api_url_for_big_resource(resource, resource_id):
     return f'https://prestable.pierce-admin.praktikum.yandex-team.ru/content/{resource_plural}/{resource_id}/'
 
 
+class UrlClassification(NamedTuple):
+    resource: Optional[str]
+    resource_plural: Optional[str]
+    api_url: Optional[str]
+    resource_id: Optional[str]
+    sprint_id: Optional[str]
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_url(url: str) -> UrlClassification:
+    """
+    Classify a URL in a single pass over its path segments, looked up in resource_type_by_segment.
+    The resource is the first of small_resource_types, then of big_resource_types, found in the URL
+    without its query string; its fields are None if there is none. The sprint id is taken from
+    the first `/sprints/<digits>/` in the whole URL.
+    """
+    parts = url.split('/')
+    # Parts after the one where the query string starts are not part of the path
+    query_start = url.find('?')
+    path_part_count = len(parts) if query_start == -1 else url.count('/', 0, query_start) + 1
+    resource_ids = {}
+    sprint_id = None
+    for index in range(1, len(parts) - 1):
+        (part, next_part) = (parts[index], parts[index + 1])
+        if sprint_id is None and part == 'sprints' and next_part.isdecimal() and index + 2 < len(parts):
+            sprint_id = next_part
+        if index + 1 < path_part_count:
+            resource = resource_type_by_segment.get(part.lower())
+            resource_id = next_part.partition('?')[0]
+            if resource is not None and resource_id and resource not in resource_ids:
+                resource_ids[resource] = resource_id
+    for resource in small_resource_types + big_resource_types:
+        if resource in resource_ids:
+            resource_id = resource_ids[resource]
+            if resource in small_resource_types:
+                return UrlClassification(resource, f'{resource}s', get_api_url_for_small_resource(resource, resource_id),
+                                         resource_id, sprint_id)
+            return UrlClassification(resource, get_resource_plural_name(resource),
+                                     get_api_url_for_big_resource(resource, resource_id), resource_id, sprint_id)
+    return UrlClassification(None, None, None, None, sprint_id)
+
+
+def classify_urls(urls: List[str]) -> List[UrlClassification]:
+    """Classify a batch of URLs, e.g. all issue links of a checklist."""
+    return [classify_url(url) for url in urls]
+
+
 def identify_resource(url: str) -> tuple:
     """
     Identify the resource type a URL is pointing at.
     Returns a tuple of the singular and plural names of the resource, its API URL, and the resource ID.
     """
-    url = url.split('?')[0]
-
-    for resource in small_resource_types:
-        match = re.search(fr'/{resource}s?/([^/]+)', url, re.IGNORECASE)
-        if match:
-            resource_id = match.group(1)
-            api_url = get_api_url_for_small_resource(resource, resource_id)
-            return (resource, f'{resource}s', api_url, resource_id)
-
-    for resource in big_resource_types:
-        resource_plural = get_resource_plural_name(resource)
-        match = re.search(fr'/(?:{resource}|{resource_plural})/([^/]+)', url, re.IGNORECASE)
-        if match:
-            resource_id = match.group(1)
-            api_url = get_api_url_for_big_resource(resource, resource_id)
-            return (resource, resource_plural, api_url, resource_id)
-
-    raise ValueError('Invalid URL or unsupported resource type')
+    classification = classify_url(url)
+    if classification.resource is None:
+        raise ValueError('Invalid URL or unsupported resource type')
+    return classification[:4]
 
 
 def build_resource_url(resource_plural: str, resource_id: str):
     return f'https://prestable.pierce-admin.praktikum.yandex-team.ru/content/{resource_plural}/{resource_id}/'
 
 
+def is_error_payload(data) -> bool:
+    """Whether Pierce answered with an error payload instead of the resource."""
+    return isinstance(data, dict) and bool(data.get('errors'))
+
+
 def preprocess_url(url: str) -> str:
     """
     Simplify URL to remove parameters and identify the API URL.
@@ -94,58 +132,72 @@ async def postprocess_fetched_data(
         result['sprint']['id'] = sprint_id
 
     def get_resource_info_key(_resource_info, _key, _key_with_resource):
-        result = resource_info.get(_key, None)
-        errors = resource_info.get('errors', [])
+        result = _resource_info.get(_key, None)
+        errors = _resource_info.get('errors', [])
         if errors and not settings['ignore_errors'].get(_key_with_resource):
             raise LoggerUtils(__name__).create_exception(
                 'RESOURCE_INFO_KEY_ERROR', KeyError, upstream_error=str(errors), key=_key, key_with_resource=_key_with_resource)
         return result
 
-    for resource in result:
-        resource_data = result[resource]
+    missing_resources = [
+        resource for (resource, resource_data) in result.items()
         if ('name' not in resource_data and resource != 'task') or (
-                resource == 'task' and 'description' not in resource_data):
-            resource_plural = get_resource_plural_name(resource)
-            resource_url = build_resource_url(resource_plural, resource_data['id'])
-            resource_info = {}
-            try:
-                resource_info = await browser_manager.fetch_from_external_api_async(
-                    resource_url, 'postprocess_fetched_data')
-                if 'position' in resource_info:
-                    result[resource]['position_if_exists'] = get_resource_info_key(
-                        resource_info, 'position', f'{resource}.position')
-                if resource == 'task':
-                    result[resource]['description'] = get_resource_info_key(
-                        resource_info, 'description', f'{resource}.description')
-                    result[resource]['position'] = get_resource_info_key(
-                        resource_info, 'position', f'{resource}.position')
-                else:
-                    result[resource]['name'] = get_resource_info_key(
-                        resource_info, 'name', f'{resource}.name')
-            except Exception as e:
-                error_msg = LoggerUtils(__name__).log(
-                    'postprocess_fetched_data_error', LoggerUtils.levels.ERROR, e=e,
-                    resource_info=json.dumps(resource_info), url=url, issue=issue.model_dump_json())
-                await checklist_error_messages.append((issue.key, error_msg))
-                continue
+            resource == 'task' and 'description' not in resource_data)]
+    resource_urls = {
+        resource: build_resource_url(get_resource_plural_name(resource), result[resource]['id'])
+        for resource in missing_resources}
+    outcomes = {}
+    # The index is not trusted for longer than the resource cache, so a TTL of 0 skips it
+    for resource in missing_resources:
+        index_max_age = min(settings['content_index_max_age_seconds'],
+                            settings['resource_cache_ttl_seconds'].get(resource, 0))
+        if settings['content_index_enabled'] and index_max_age > 0:
+            resource_info = browser_manager.content_index.get(resource, result[resource]['id'], index_max_age)
+            if resource_info:
+                outcomes[resource_urls[resource]] = {'data': resource_info}
+    # The levels are independent once their ids are known, so the remaining ones are fetched together
+    urls_to_fetch = [url for url in resource_urls.values() if url not in outcomes]
+    if urls_to_fetch:
+        outcomes.update(await browser_manager.fetch_many_from_external_api_async(
+            urls_to_fetch, 'postprocess_fetched_data', concurrency=settings['hierarchy_fetch_concurrency']))
+
+    for resource in missing_resources:
+        resource_url = resource_urls[resource]
+        resource_info = {}
+        try:
+            outcome = outcomes[resource_url]
+            if 'error' in outcome:
+                raise outcome['error']
+            resource_info = outcome['data']
+            if 'position' in resource_info:
+                result[resource]['position_if_exists'] = get_resource_info_key(
+                    resource_info, 'position', f'{resource}.position')
+            if resource == 'task':
+                result[resource]['description'] = get_resource_info_key(
+                    resource_info, 'description', f'{resource}.description')
+                result[resource]['position'] = get_resource_info_key(
+                    resource_info, 'position', f'{resource}.position')
+            else:
+                result[resource]['name'] = get_resource_info_key(
+                    resource_info, 'name', f'{resource}.name')
+        except Exception as e:
+            error_msg = LoggerUtils(__name__).log(
+                'postprocess_fetched_data_error', LoggerUtils.levels.ERROR, e=e,
+                resource_info=json.dumps(resource_info), url=url, issue=issue.model_dump_json(),
+                retry_after_seconds=browser_manager.negative_cache.retry_after_seconds(resource_url))
+            await checklist_error_messages.append((issue.key, error_msg))
     return result
 
 
 def extract_sprint_id(url):
-    # Define a regular expression pattern to match the sprint ID
-    pattern = r'/sprints/(\d+)/'
-
-    # Use re.search to find the match in the URL
-    match = re.search(pattern, url)
-
-    if match:
-        # Group 1 of the match contains the sprint ID
-        sprint_id = match.group(1)
-        return sprint_id
-    else:
-        # If no match is found, return None or raise an exception as needed
-        return None
+    return classify_url(url).sprint_id
 
 
 big_resource_types = ['topic', 'sprint', 'course', 'track', 'profession', 'faculty']
 small_resource_types = ['task', 'lesson']
+
+# Both the singular and the plural form of a resource type name the resource in a URL path
+resource_type_by_segment = {
+    **{name: resource for resource in big_resource_types for name in (resource, get_resource_plural_name(resource))},
+    **{name: resource for resource in small_resource_types for name in (resource, f'{resource}s')},
+}
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Optional
+
+import httpx
+
+from config.config import get_settings
+from utils.log import LoggerUtils
+
+AUTH_FAILURE_STATUS_CODES = (401, 403)
+
+
+class PierceHttpClient:
+    """
+    Fetches Pierce resources over plain HTTP with the cookies of the browser session.
+    The browser stays the source of authentication: its cookies are exported into
+    a pooled httpx client and re-exported only when Pierce rejects them.
+    """
+
+    def __init__(self, browser_manager):
+        self.browser_manager = browser_manager
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
+        self._cookies_lock = asyncio.Lock()
+        # Incremented on every cookie export, so concurrent auth failures trigger one refresh
+        self._cookies_version = 0
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        async with self._client_lock:
+            if self._client is None:
+                config = await get_settings()
+                self._client = httpx.AsyncClient(
+                    # Redirects are not followed, as Pierce redirects to the login page when cookies expire
+                    follow_redirects=False,
+                    timeout=config['direct_http_timeout_seconds'],
+                    limits=httpx.Limits(max_connections=config['direct_http_max_connections'],
+                                        max_keepalive_connections=config['direct_http_max_connections']))
+                await self._refresh_cookies(self._cookies_version)
+            return self._client
+
+    def _get_browser_cookies(self) -> list:
+        return self.browser_manager.get_driver().get_cookies()
+
+    async def _refresh_cookies(self, stale_version: int):
+        async with self._cookies_lock:
+            if self._cookies_version != stale_version:
+                # Another request has already refreshed the cookies
+                return
+            browser_cookies = await self.browser_manager.command_executor.run(self._get_browser_cookies)
+            cookies = httpx.Cookies()
+            for cookie in browser_cookies:
+                cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+            self._client.cookies = cookies
+            self._cookies_version += 1
+            LoggerUtils(__name__).log('browser_cookies_exported', level=LoggerUtils.levels.INFO,
+                                      cookie_count=len(browser_cookies), cookies_version=self._cookies_version)
+
+    @staticmethod
+    def _is_auth_failure(response: httpx.Response) -> bool:
+        return response.status_code in AUTH_FAILURE_STATUS_CODES or response.is_redirect
+
+    async def fetch(self, url: str):
+        """Fetch and parse a Pierce API url, re-exporting the browser cookies once if the session is rejected."""
+        client = await self._get_client()
+        cookies_version = self._cookies_version
+        response = await client.get(url)
+        if self._is_auth_failure(response):
+            LoggerUtils(__name__).log('pierce_session_rejected', level=LoggerUtils.levels.INFO,
+                                      url=url, status_code=response.status_code)
+            await self._refresh_cookies(cookies_version)
+            response = await client.get(url)
+            if self._is_auth_failure(response):
+                raise LoggerUtils(__name__).create_exception(
+                    'pierce_http_auth_failure', RuntimeError, log=True,
+                    url=url, status_code=response.status_code, location=response.headers.get('location'))
+        # Error payloads are returned as is, just like the in-page fetch does
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LoggerUtils(__name__).create_exception(
+                'pierce_http_invalid_json', RuntimeError, log=True, original_exception=e,
+                url=url, status_code=response.status_code)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
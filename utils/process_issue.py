@@ -1,6 +1,6 @@
 import os
 from datetime import datetime
-from typing import Optional, Union
+from typing import Dict, Optional, Union
 
 from fastapi import HTTPException
 
@@ -8,47 +8,107 @@ from config.config import match_breadcrumbs_to_tracker_fields, ISSUE_URL, TRACKE
 from utils.log import LoggerUtils
 from utils.pierce_api import preprocess_url, postprocess_fetched_data
 from utils.tracker import patch_tracker_issue
+from utils.tracker_write_planner import tracker_write_planner
 
 
-async def process_and_update_issue(issue, issue_patch_url, issue_field_keys, response_data):
+class IssuePatchStats:
+    """Counts the tracker writes spent on issue fields against the one-write-per-field baseline."""
+
+    def __init__(self):
+        self.issues = 0
+        self.writes = 0
+        self.writes_saved = 0
+        self.fallbacks = 0
+
+    def record(self, field_count: int, writes: int, fallback: bool):
+        self.issues += 1
+        self.writes += writes
+        # Without consolidation every field and the error field clearing were a write of their own
+        self.writes_saved += field_count - writes
+        self.fallbacks += fallback
+
+    def stats(self) -> dict:
+        return {
+            'issues': self.issues,
+            'writes': self.writes,
+            'writes_saved': self.writes_saved,
+            'writes_saved_per_issue': round(self.writes_saved / self.issues, 2) if self.issues else 0,
+            'fallbacks': self.fallbacks,
+        }
+
+
+issue_patch_stats = IssuePatchStats()
+
+
+async def process_and_update_issue(issue, issue_patch_url, issue_field_keys, response_data,
+                                   checklist_updates: Optional['ChecklistUpdateBuffer'] = None):
     from main import browser_manager
-    api_url = preprocess_url(issue.link)
+    # Links the checklist classification could not make out are preprocessed for the error they raise
+    api_url = issue.api_url or preprocess_url(issue.link)
     result = await browser_manager.fetch_from_external_api_async(api_url, url_source='patch_issue_fields')
-    error_count = len(response_data['errors'])
+    # Issues are processed concurrently, so only the errors of this issue count
+    error_count = _count_issue_errors(response_data['errors'], issue.key)
     data = await postprocess_fetched_data(
         browser_manager, api_url, result, issue=issue, checklist_error_messages=response_data['errors'])
-    postprocessed_success = len(response_data['errors']) == error_count
+    postprocessed_success = _count_issue_errors(response_data['errors'], issue.key) == error_count
 
     # Map breadcrumb fields to tracker fields
     tracker_fields, unset_field_keys = match_breadcrumbs_to_tracker_fields(data, issue_field_keys)
+    if postprocessed_success:
+        # Errors met while postprocessing have already been written to the error field, so it is cleared on success only
+        tracker_fields[os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY')] = ''
 
-    # Issue PATCH requests to update tracker fields
-    for field_key, field_value in tracker_fields.items():
-        patch_data = {field_key: field_value}
-        patch_response = await patch_tracker_issue(issue_patch_url, patch_data)
-        if patch_response.status_code != 200:
-            err_context = dict(**patch_data)
-            raise LoggerUtils(__name__).create_exception(
-                err_code='failed_to_patch_issue_field',
-                err_type=HTTPException,
-                err_kwargs={'status_code': patch_response.status_code},
-                log=True, **err_context)
+    await patch_issue_fields(issue_patch_url, tracker_fields)
 
     if postprocessed_success:
         # After successfully patching the issue fields, mark the checklist item as checked
-        await set_listitem_done_status(checklist_item_id=issue.checklist_item_id, done=True, deadline_datetime=datetime.now())
+        await set_listitem_done_status(checklist_item_id=issue.checklist_item_id, done=True, deadline_datetime=datetime.now(),
+                                       updates=checklist_updates)
         issue.done = True
 
     response_data[issue_patch_url] = data
 
 
-async def set_listitem_done_status(checklist_item_id, done: bool, deadline_datetime: Optional[Union[str, datetime]] = None):
-    """Checks or unchecks the issue item in the tracker,
-    and mutates its `done` attribute if the status change was successful.
-    If `deadline_datetime` is defaulted, it'll be left unchanged.
+def _count_issue_errors(errors, issue_key) -> int:
+    return sum(1 for (error_issue_key, _) in errors if error_issue_key == issue_key)
+
+
+async def patch_issue_fields(issue_patch_url, tracker_fields: dict):
+    """Updates all changed fields of an issue in one PATCH request.
+    If the tracker rejects it, the fields are patched one by one, so that the rejected ones are known.
     """
-    checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
-    checklist_item_url = f"{checklist_issue_url}/checklistItems/{checklist_item_id}/"
+    field_count = len(tracker_fields)
+    # Fields already holding their values are left out
+    tracker_fields = tracker_write_planner.plan(issue_patch_url, tracker_fields)
+    if not tracker_fields:
+        issue_patch_stats.record(field_count, writes=0, fallback=False)
+        return
+    patch_response = await patch_tracker_issue(issue_patch_url, tracker_fields)
+    if patch_response is not None and patch_response.status_code == 200:
+        issue_patch_stats.record(field_count, writes=1, fallback=False)
+        LoggerUtils(__name__).log('issue_fields_patched', level=LoggerUtils.levels.DEBUG,
+                                  url=issue_patch_url, fields=len(tracker_fields), writes=1)
+        return
+
+    LoggerUtils(__name__).log(
+        'consolidated_issue_patch_rejected', level=LoggerUtils.levels.WARNING, url=issue_patch_url,
+        status_code=getattr(patch_response, 'status_code', None), fields=list(tracker_fields))
+    rejected_fields = {}
+    for field_key, field_value in tracker_fields.items():
+        patch_response = await patch_tracker_issue(issue_patch_url, {field_key: field_value})
+        if patch_response is None or patch_response.status_code != 200:
+            rejected_fields[field_key] = getattr(patch_response, 'status_code', None)
+    issue_patch_stats.record(field_count, writes=1 + len(tracker_fields), fallback=True)
+    if rejected_fields:
+        raise LoggerUtils(__name__).create_exception(
+            err_code='failed_to_patch_issue_field',
+            err_type=HTTPException,
+            err_kwargs={'status_code': next(iter(rejected_fields.values())) or 502},
+            log=True, url=issue_patch_url, rejected_fields=rejected_fields,
+            **{field_key: tracker_fields[field_key] for field_key in rejected_fields})
+
+
+def _checklist_item_patch_data(done: bool, deadline_datetime: Optional[Union[str, datetime]] = None) -> dict:
     checklist_patch_data = {
         "checked": done,
     }
@@ -61,6 +121,22 @@ async def set_listitem_done_status(checklist_item_id, done: bool, deadline_datet
                 "deadlineType": "date"
             }
         })
+    return checklist_patch_data
+
+
+async def set_listitem_done_status(checklist_item_id, done: bool, deadline_datetime: Optional[Union[str, datetime]] = None,
+                                   updates: Optional['ChecklistUpdateBuffer'] = None):
+    """Checks or unchecks the issue item in the tracker,
+    and mutates its `done` attribute if the status change was successful.
+    If `deadline_datetime` is defaulted, it'll be left unchanged.
+    If an `updates` buffer is given, the change is only buffered and the returned response is None.
+    """
+    checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
+    checklist_item_url = f"{checklist_issue_url}/checklistItems/{checklist_item_id}/"
+    checklist_patch_data = _checklist_item_patch_data(done, deadline_datetime)
+    if updates is not None:
+        updates.add(checklist_item_id, checklist_patch_data)
+        return checklist_item_url, None
     checklist_patch_response = await patch_tracker_issue(checklist_item_url, checklist_patch_data)
     if checklist_patch_response.status_code != 200:
         raise LoggerUtils(__name__).create_exception(
@@ -71,6 +147,67 @@ async def set_listitem_done_status(checklist_item_id, done: bool, deadline_datet
     return checklist_item_url, checklist_patch_response
 
 
+class ChecklistUpdateBuffer:
+    """
+    Buffers the check, uncheck and deadline changes of the TRACKER_CHECKLIST_ISSUE_ID checklist items during a run,
+    so that they are sent in as few PATCH requests of the whole checklist as possible when flushed.
+    A rejected bulk request is retried item by item.
+    """
+
+    def __init__(self, max_items_per_request: int):
+        self.max_items_per_request = max_items_per_request
+        # Later changes of an item are merged into the earlier ones
+        self._updates: Dict[str, dict] = {}
+        self.requests = 0
+
+    @property
+    def pending(self) -> int:
+        """The number of items with changes waiting to be flushed."""
+        return len(self._updates)
+
+    def add(self, checklist_item_id: str, checklist_patch_data: dict):
+        self._updates.setdefault(checklist_item_id, {}).update(checklist_patch_data)
+
+    def discard(self, checklist_item_id: str):
+        """Drops the buffered changes of an item, e.g. because it is deleted."""
+        self._updates.pop(checklist_item_id, None)
+
+    async def flush(self) -> Dict[str, Optional[int]]:
+        """Sends the buffered changes. Returns the status codes of the items that could not be updated by id."""
+        checklist_url = f"{ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)}/checklistItems"
+        updates = list(self._updates.items())
+        self._updates = {}
+        failed_items = {}
+        fell_back_items = 0
+        for start in range(0, len(updates), self.max_items_per_request):
+            batch = updates[start:start + self.max_items_per_request]
+            self.requests += 1
+            response = await patch_tracker_issue(
+                checklist_url, [{'id': checklist_item_id, **patch_data} for (checklist_item_id, patch_data) in batch])
+            if response is not None and response.status_code == 200:
+                continue
+            LoggerUtils(__name__).log(
+                'bulk_checklist_update_rejected', level=LoggerUtils.levels.WARNING, url=checklist_url,
+                status_code=getattr(response, 'status_code', None), items=len(batch))
+            fell_back_items += len(batch)
+            for (checklist_item_id, patch_data) in batch:
+                self.requests += 1
+                response = await patch_tracker_issue(f'{checklist_url}/{checklist_item_id}/', patch_data)
+                if response is None or response.status_code != 200:
+                    failed_items[checklist_item_id] = getattr(response, 'status_code', None)
+        LoggerUtils(__name__).log('checklist_updates_flushed', level=LoggerUtils.levels.INFO,
+                                  items=len(updates), requests=self.requests,
+                                  fell_back_items=fell_back_items, failed_items=failed_items)
+        return failed_items
+
+
+def create_checklist_update_buffer(config) -> Optional[ChecklistUpdateBuffer]:
+    """Returns a buffer for the checklist changes of a run if bulk_checklist_updates is set, None otherwise."""
+    if not config['bulk_checklist_updates']:
+        return None
+    return ChecklistUpdateBuffer(config['bulk_checklist_update_max_items'])
+
+
 async def handle_issue_processing_error(exception, issue, issue_patch_url, response_data):
     error_msg = LoggerUtils(__name__).log(
         msg_or_err_code=str(exception), level=LoggerUtils.levels.ERROR, e=exception,
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from utils.log import LoggerUtils
+
+
+class ResourceCache:
+    """
+    A bounded in-memory cache of fetched Pierce resources keyed by API URL.
+    Each entry expires after the TTL of its resource type; when the cache is full,
+    the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries: int):
+        if max_entries < 1:
+            raise LoggerUtils(__name__).create_exception(
+                'invalid_resource_cache_size', ValueError, log=True, max_entries=max_entries)
+        self.max_entries = max_entries
+        # url -> (resource_type, expires_at, data), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, url: str) -> Optional[Any]:
+        """Returns the cached data of the url, or None if it is not cached or has expired."""
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        (_, expires_at, data) = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[url]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return data
+
+    def set(self, url: str, data: Any, resource_type: str, ttl_seconds: float):
+        if ttl_seconds <= 0:
+            return
+        self._entries[url] = (resource_type, time.monotonic() + ttl_seconds, data)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, url: Optional[str] = None, resource_type: Optional[str] = None) -> int:
+        """Drops the entry of the url, every entry of the resource type, or, with neither given, all entries.
+        Returns the number of entries dropped."""
+        if url is not None:
+            return 1 if self._entries.pop(url, None) is not None else 0
+        if resource_type is None:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+        urls = [cached_url for (cached_url, (cached_type, _, _)) in self._entries.items()
+                if cached_type == resource_type]
+        for cached_url in urls:
+            del self._entries[cached_url]
+        return len(urls)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+        }
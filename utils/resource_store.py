@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Optional, Tuple
+
+from utils.log import LoggerUtils
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS resources ('
+    'url TEXT PRIMARY KEY, '
+    'resource_type TEXT NOT NULL, '
+    'fetched_at REAL NOT NULL, '
+    'payload BLOB NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS resources_fetched_at ON resources (fetched_at)',
+)
+
+
+# The fraction of max_entries dropped at once when the store overflows
+TRIM_BATCH_FRACTION = 0.1
+
+
+class ResourceStore:
+    """
+    A SQLite-backed store of fetched Pierce resources keyed by API URL, kept across restarts.
+    Payloads are stored as zlib-compressed JSON along with the time they were fetched;
+    once the store holds more than max_entries, the least recently fetched entries are dropped in a batch
+    of TRIM_BATCH_FRACTION of max_entries, so that most writes do not trim at all.
+    The methods block, so async callers run them in a thread.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        if max_entries < 1:
+            raise LoggerUtils(__name__).create_exception(
+                'invalid_resource_store_size', ValueError, log=True, max_entries=max_entries)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+        # Kept up to date by the writes, so that they need not count the rows
+        (self._entries,) = self._connection.execute('SELECT COUNT(*) FROM resources').fetchone()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[Tuple[Any, float]]:
+        """Returns the stored data of the url with the time.time() it was fetched at, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT payload, fetched_at FROM resources WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        (payload, fetched_at) = row
+        return json.loads(zlib.decompress(payload)), fetched_at
+
+    def put(self, url: str, data: Any, resource_type: str, fetched_at: Optional[float] = None):
+        payload = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            is_new = self._connection.execute('SELECT 1 FROM resources WHERE url = ?', (url,)).fetchone() is None
+            self._connection.execute(
+                'INSERT OR REPLACE INTO resources (url, resource_type, fetched_at, payload) VALUES (?, ?, ?, ?)',
+                (url, resource_type, fetched_at or time.time(), payload))
+            self._entries += is_new
+            if self._entries > self.max_entries:
+                self._trim()
+
+    def _trim(self):
+        """Drops the least recently fetched entries down to below max_entries. Called with the lock held."""
+        excess = self._entries - self.max_entries + max(1, int(self.max_entries * TRIM_BATCH_FRACTION))
+        self._entries -= self._connection.execute(
+            'DELETE FROM resources WHERE url IN (SELECT url FROM resources ORDER BY fetched_at LIMIT ?)',
+            (excess,)).rowcount
+
+    def invalidate(self, url: Optional[str] = None, resource_type: Optional[str] = None) -> int:
+        """Drops the entry of the url, every entry of the resource type, or, with neither given, all entries.
+        Returns the number of entries dropped."""
+        if url is not None:
+            (statement, params) = ('DELETE FROM resources WHERE url = ?', (url,))
+        elif resource_type is not None:
+            (statement, params) = ('DELETE FROM resources WHERE resource_type = ?', (resource_type,))
+        else:
+            (statement, params) = ('DELETE FROM resources', ())
+        with self._lock:
+            invalidated = self._connection.execute(statement, params).rowcount
+            self._entries -= invalidated
+        return invalidated
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries, payload_bytes) = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM resources').fetchone()
+        return {
+            'path': str(self.path),
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'payload_bytes': payload_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
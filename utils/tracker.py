@@ -1,45 +1,65 @@
+import asyncio
 import json
 import os
-from typing import Tuple, List
+from typing import Iterable, Optional, Tuple, List
 
-import httpx
 from fastapi import HTTPException
 
 from config.config import (
-    ISSUE_URL, TRACKER_CHECKLIST_ISSUE_ID, TRACKER_PATCH_TIMEOUT)
-from models import IssueModel, IssueData
+    ISSUE_URL, TRACKER_CHECKLIST_ISSUE_ID, TRACKER_PATCH_TIMEOUT, TRACKER_LINK_KEY, TRACKER_BREADCRUMBS_ERROR_KEY,
+    get_settings, load_issue_field_keys)
+from models import IssueModel, IssueData, create_issue_model
 from utils.log import LoggerUtils
+from utils.pierce_api import classify_urls
+from utils.tracker_client import tracker_http_client
+from utils.tracker_write_planner import tracker_write_planner
 
+# The fields read from the checklist issue and from the issues of its items
+CHECKLIST_ISSUE_FIELDS = ('key', 'checklistItems', TRACKER_BREADCRUMBS_ERROR_KEY)
+ITEM_ISSUE_FIELDS = ('key', TRACKER_LINK_KEY, TRACKER_BREADCRUMBS_ERROR_KEY)
 
-async def delete_tracker_issue(url):
-    import httpx
 
-    headers = {'Authorization': f'Bearer {os.getenv("TRACKER_OAUTH_TOKEN")}'}
-    async with httpx.AsyncClient() as client:
-        return await client.delete(url, headers=headers)
+async def delete_tracker_issue(url):
+    return await tracker_http_client.request('DELETE', url)
 
 
 async def patch_tracker_issue(url, data):
-    import httpx
-
-    headers = {'Authorization': f'Bearer {os.getenv("TRACKER_OAUTH_TOKEN")}'}
     timeout = TRACKER_PATCH_TIMEOUT
-    async with httpx.AsyncClient() as client:
-        try:
-            return await client.patch(url, json=data, headers=headers,
-                                      timeout=timeout)
-        except Exception as e:
-            # patch errors are logged without being saved in tracker to prevent circular failures.
-            LoggerUtils(__name__).log(
-                'patch_tracker_issue_error', level=LoggerUtils.levels.ERROR,
-                url=url, json=data, timeout=timeout, original_exception=e)
-
-
-async def get_issue(issue_id: str) -> IssueModel:
-    headers = {'Authorization': f"Bearer {os.getenv('TRACKER_OAUTH_TOKEN')}"}
+    try:
+        response = await tracker_http_client.request('PATCH', url, json=data, timeout=timeout)
+        if isinstance(data, dict):
+            if response.status_code == 200:
+                tracker_write_planner.record_write(url, data)
+            else:
+                tracker_write_planner.forget(url)
+        return response
+    except Exception as e:
+        tracker_write_planner.forget(url)
+        # patch errors are logged without being saved in tracker to prevent circular failures.
+        LoggerUtils(__name__).log(
+            'patch_tracker_issue_error', level=LoggerUtils.levels.ERROR,
+            url=url, json=data, timeout=timeout, original_exception=e)
+
+
+async def patch_changed_issue_fields(url, data):
+    """Patches the fields of an issue whose values differ from the ones it is known to have.
+    Returns None without a request if there are none."""
+    changes = tracker_write_planner.plan(url, data)
+    if changes:
+        return await patch_tracker_issue(url, changes)
+
+
+async def get_issue(issue_id: str, fields: Optional[Iterable[str]] = None) -> IssueModel:
+    """Returns the issue with all fields of IssueModel,
+    or with the given fields only, which are the only ones requested from the tracker then."""
     url = ISSUE_URL.format(issue_id=issue_id)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
+    if fields is None:
+        model = IssueModel
+        response = await tracker_http_client.request('GET', url)
+    else:
+        fields = frozenset(fields)
+        model = create_issue_model(fields)
+        response = await tracker_http_client.request('GET', url, params={'fields': ','.join(sorted(fields))})
     if response.status_code != 200:
         raise LoggerUtils(__name__).create_exception(
             'tracker_checklist_retrieval_error',
@@ -48,7 +68,8 @@ async def get_issue(issue_id: str) -> IssueModel:
             url=url
         )
     try:
-        issue = IssueModel.model_validate_json(response.text)
+        issue = model.model_validate_json(response.text)
+        tracker_write_planner.record_issue(url, issue.model_dump(exclude={'checklistItems'}))
         return issue
     except Exception as e:
         raise LoggerUtils(__name__).create_exception(
@@ -62,53 +83,75 @@ async def get_issue(issue_id: str) -> IssueModel:
 
 async def process_checklist_items(checklist_issue) -> Tuple[
     List[dict], List[IssueData], List[Tuple[str, str]]]:
+    config = await get_settings()
+    # The issues of the unchecked items are looked up concurrently
+    semaphore = asyncio.Semaphore(config['tracker_lookup_concurrency'])
+    # The breadcrumb fields are read as well, so that the values they already have are not written again
+    fields = ITEM_ISSUE_FIELDS + tuple(
+        field_key for (key, field_key) in load_issue_field_keys().items() if key.startswith('TRACKER_') and field_key)
+
+    async def process_checklist_item(checklist_item):
+        async with semaphore:
+            return await _process_checklist_item(checklist_item, fields)
+
     checked_items = []
     unchecked_items = []
     checklist_error_messages = []
-    for checklist_item in checklist_issue.checklistItems:
-        try:
-            if checklist_item.checked:
-                checked_items.append(
-                    {'key': checklist_item.text, 'id': checklist_item.id})
-            else:
-                individual_issue = await get_issue(checklist_item.text)
-                link = getattr(individual_issue, os.getenv('TRACKER_LINK_KEY'),
-                               None)
-                if link is None:
-                    error_msg = LoggerUtils(__name__).log(
-                        'link_is_not_set_for_issue',
-                        level=LoggerUtils.levels.ERROR,
-                        issue_id=checklist_item.text)
-                    error_patch_data = {
-                        os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): error_msg
-                    }
-                    tracker_issue_patch_url = ISSUE_URL.format(
-                        issue_id=checklist_item.text)
-                    await patch_tracker_issue(tracker_issue_patch_url,
-                                              error_patch_data)
-                    checklist_error_messages.append(
-                        (checklist_item.text, error_msg))
-
-                    continue
-
-                issue_data = IssueData(link=link, key=checklist_item.text,
-                                       checklist_item_id=checklist_item.id)
-                unchecked_items.append(issue_data)
-        except Exception as e:
-            error_msg = LoggerUtils(__name__).log(
-                'checklist_item_processing_error',
-                level=LoggerUtils.levels.ERROR, e=e,
-                checklist_item_id=checklist_item.id, issue=checklist_item.text)
-            checklist_error_messages.append((checklist_item.text, error_msg))
-
-            continue
+    results = await asyncio.gather(
+        *(process_checklist_item(checklist_item) for checklist_item in checklist_issue.checklistItems))
+    # Results are collected in checklist order
+    for (checked_item, issue_data, error_message) in results:
+        if checked_item is not None:
+            checked_items.append(checked_item)
+        if issue_data is not None:
+            unchecked_items.append(issue_data)
+        if error_message is not None:
+            checklist_error_messages.append(error_message)
+    # The links of the whole checklist are classified in one call; their API URLs spare preprocessing them
+    # one by one, and their sprint ids are then found in the memo
+    for (issue_data, classification) in zip(unchecked_items, classify_urls([issue.link for issue in unchecked_items])):
+        issue_data.api_url = classification.api_url
 
     return checked_items, unchecked_items, checklist_error_messages
 
 
+async def _process_checklist_item(checklist_item, fields) -> Tuple[
+        Optional[dict], Optional[IssueData], Optional[Tuple[str, str]]]:
+    """Returns the checked item, the issue data of an unchecked item or the error message of the item."""
+    try:
+        if checklist_item.checked:
+            return {'key': checklist_item.text, 'id': checklist_item.id}, None, None
+        individual_issue = await get_issue(checklist_item.text, fields=fields)
+        link = getattr(individual_issue, os.getenv('TRACKER_LINK_KEY'),
+                       None)
+        if link is None:
+            error_msg = LoggerUtils(__name__).log(
+                'link_is_not_set_for_issue',
+                level=LoggerUtils.levels.ERROR,
+                issue_id=checklist_item.text)
+            error_patch_data = {
+                os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): error_msg
+            }
+            tracker_issue_patch_url = ISSUE_URL.format(
+                issue_id=checklist_item.text)
+            await patch_changed_issue_fields(tracker_issue_patch_url,
+                                             error_patch_data)
+            return None, None, (checklist_item.text, error_msg)
+
+        issue_data = IssueData(link=link, key=checklist_item.text,
+                               checklist_item_id=checklist_item.id)
+        return None, issue_data, None
+    except Exception as e:
+        error_msg = LoggerUtils(__name__).log(
+            'checklist_item_processing_error',
+            level=LoggerUtils.levels.ERROR, e=e,
+            checklist_item_id=checklist_item.id, issue=checklist_item.text)
+        return None, None, (checklist_item.text, error_msg)
+
+
 async def clear_error_field(issue_patch_url):
-    await patch_tracker_issue(issue_patch_url,
-                              {os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): ''})
+    await patch_changed_issue_fields(issue_patch_url,
+                                     {os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): ''})
 
 
 async def report_individual_issue_error(issue, error):
@@ -119,7 +162,7 @@ async def report_individual_issue_error(issue, error):
         os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): json.dumps(error)
     }
     issue_url = ISSUE_URL.format(issue_id=issue)
-    await patch_tracker_issue(issue_url, error_field_data)
+    await patch_changed_issue_fields(issue_url, error_field_data)
 
 
 async def report_aggregated_errors(checklist_error_messages):
@@ -134,4 +177,4 @@ async def report_aggregated_errors(checklist_error_messages):
         os.getenv('TRACKER_BREADCRUMBS_ERROR_KEY'): accumulated_error_msg
     }
     checklist_issue_url = ISSUE_URL.format(issue_id=TRACKER_CHECKLIST_ISSUE_ID)
-    await patch_tracker_issue(checklist_issue_url, error_field_data)
+    await patch_changed_issue_fields(checklist_issue_url, error_field_data)
@@ -0,0 +1,77 @@
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+from config.config import get_settings_sync, TRACKER_OAUTH_TOKEN
+from utils.log import LoggerUtils
+
+
+class TrackerHttpClient:
+    """
+    The one HTTP client all tracker requests go through, so that connections are pooled and kept alive
+    instead of being set up for every request. Authentication, timeout and pool limits are configured
+    when the client is first used; it is closed on shutdown.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.max_connections: Optional[int] = None
+        # Responses by the HTTP version they came over, e.g. to tell whether HTTP/2 is negotiated
+        self.responses_by_http_version: Dict[str, int] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            config = get_settings_sync()
+            self.http2 = config['tracker_http2']
+            if self.http2 and importlib.util.find_spec('h2') is None:
+                LoggerUtils(__name__).log('tracker_http2_unavailable', level=LoggerUtils.levels.WARNING,
+                                          detail='The h2 package is not installed, HTTP/1.1 is used instead.')
+                self.http2 = False
+            self.max_connections = config['tracker_max_connections']
+            self._client = httpx.AsyncClient(
+                headers={'Authorization': f'Bearer {TRACKER_OAUTH_TOKEN}'},
+                timeout=config['tracker_timeout_seconds'],
+                limits=httpx.Limits(max_connections=config['tracker_max_connections'],
+                                    max_keepalive_connections=config['tracker_max_connections']),
+                http2=self.http2,
+                event_hooks={'response': [self._record_response]})
+        return self._client
+
+    async def _record_response(self, response: httpx.Response):
+        self.responses_by_http_version[response.http_version] = (
+            self.responses_by_http_version.get(response.http_version, 0) + 1)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            return await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            'http2': self.http2,
+            'max_connections': self.max_connections,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'errors': self.errors,
+            'responses_by_http_version': dict(self.responses_by_http_version),
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+tracker_http_client = TrackerHttpClient()
@@ -0,0 +1,77 @@
+import time
+from typing import Any, Dict, Tuple
+
+from config.config import get_settings_sync
+
+
+def _normalize(value: Any) -> Any:
+    # The tracker returns an empty field as null, while the app clears it with an empty string
+    return None if value == '' else value
+
+
+class TrackerWritePlanner:
+    """
+    Keeps a short-lived snapshot of the issue fields known from get_issue and from successful PATCH requests,
+    so that writes of values the tracker already holds are skipped. Fields older than
+    tracker_snapshot_ttl_seconds are not trusted and always written; a ttl of 0 disables the planner.
+    """
+
+    def __init__(self):
+        # Issue url -> field -> (value, recorded_at)
+        self._snapshots: Dict[str, Dict[str, Tuple[Any, float]]] = {}
+        self.planned_writes = 0
+        self.skipped_writes = 0
+        self.skipped_requests = 0
+
+    def record_issue(self, url: str, fields: dict):
+        """Records the fields of an issue read from the tracker."""
+        now = time.monotonic()
+        self._forget_expired(now)
+        snapshot = self._snapshots.setdefault(url, {})
+        for (field, value) in fields.items():
+            snapshot[field] = (_normalize(value), now)
+
+    def record_write(self, url: str, fields: dict):
+        """Records the fields written to an issue, if it has been read before."""
+        snapshot = self._snapshots.get(url)
+        if snapshot is None:
+            return
+        now = time.monotonic()
+        for (field, value) in fields.items():
+            snapshot[field] = (_normalize(value), now)
+
+    def forget(self, url: str):
+        self._snapshots.pop(url, None)
+
+    def _forget_expired(self, now: float):
+        ttl = get_settings_sync()['tracker_snapshot_ttl_seconds']
+        expired = [url for (url, snapshot) in self._snapshots.items()
+                   if all(now - recorded_at >= ttl for (_, recorded_at) in snapshot.values())]
+        for url in expired:
+            del self._snapshots[url]
+
+    def plan(self, url: str, fields: dict) -> dict:
+        """Returns the fields whose values differ from the ones the issue is known to have."""
+        ttl = get_settings_sync()['tracker_snapshot_ttl_seconds']
+        snapshot = self._snapshots.get(url, {})
+        now = time.monotonic()
+        changes = {}
+        for (field, value) in fields.items():
+            known = snapshot.get(field)
+            if known is None or now - known[1] >= ttl or known[0] != _normalize(value):
+                changes[field] = value
+        self.planned_writes += len(changes)
+        self.skipped_writes += len(fields) - len(changes)
+        self.skipped_requests += bool(fields) and not changes
+        return changes
+
+    def stats(self) -> dict:
+        return {
+            'snapshots': len(self._snapshots),
+            'planned_writes': self.planned_writes,
+            'skipped_writes': self.skipped_writes,
+            'skipped_requests': self.skipped_requests,
+        }
+
+
+tracker_write_planner = TrackerWritePlanner()